@@ -1,6 +1,7 @@
 import dash
 import dash_bootstrap_components as dbc
-from flask_caching import Cache
+
+from utils.catalog_cache import CatalogCache
 
 FONT_AWESOME = "https://use.fontawesome.com/releases/v5.7.2/css/all.css"
 app = dash.Dash(
@@ -16,10 +17,7 @@ server = app.server
 server.config.from_object("config")
 app.config.suppress_callback_exceptions = True
 
-cache = Cache(server, config={
-    'CACHE_TYPE': 'filesystem',
-    'CACHE_DIR': '.cache-directory',
-
-    # Maximum number of concurrent users. Modifiable
-    'CACHE_THRESHOLD': 50
-})
+catalog_cache = CatalogCache(
+    # Memory budget of the cached catalogs in bytes. Modifiable
+    max_bytes=server.config.get('CATALOG_CACHE_BYTES', 2 * 1024 ** 3)
+)
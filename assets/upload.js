@@ -0,0 +1,76 @@
+/*
+ * Streams catalog files selected in the upload area to the server as the
+ * raw request body, instead of passing them base64 encoded through a Dash
+ * callback. When the upload is done, the content hash of the parsed
+ * catalog is written as a query string into the hidden upload-result
+ * input, which triggers the callback that shows the result.
+ */
+var UPLOAD_URL = '/upload-catalog';
+
+function setUploadResult(value) {
+    var input = document.getElementById('upload-result');
+    // The input is a React component, which only sees values set through
+    // the native setter followed by an input event, as typed by the user
+    var setter = Object.getOwnPropertyDescriptor(
+        window.HTMLInputElement.prototype, 'value'
+    ).set;
+    setter.call(input, value);
+    input.dispatchEvent(new Event('input', {bubbles: true}));
+}
+
+function uploadCatalog(file) {
+    if (!file) {
+        return;
+    }
+
+    var status = document.getElementById('upload-status');
+    status.textContent = ' (uploading ' + file.name + '...)';
+
+    fetch(UPLOAD_URL + '?filename=' + encodeURIComponent(file.name), {
+        method: 'POST',
+        body: file,
+        credentials: 'same-origin',
+        headers: {'Content-Type': 'application/octet-stream'}
+    }).then(function (response) {
+        return response.json();
+    }).catch(function () {
+        return {};
+    }).then(function (result) {
+        status.textContent = '';
+        var query = new URLSearchParams({
+            catalog: result.catalog || '',
+            filename: file.name,
+            // Changes the value on repeated uploads of the same file
+            upload: Date.now()
+        });
+        setUploadResult('?' + query.toString());
+    });
+}
+
+function isUploadArea(element) {
+    return element.closest && element.closest('#upload-data') !== null;
+}
+
+document.addEventListener('click', function (event) {
+    if (isUploadArea(event.target)) {
+        var input = document.createElement('input');
+        input.type = 'file';
+        input.addEventListener('change', function () {
+            uploadCatalog(input.files[0]);
+        });
+        input.click();
+    }
+});
+
+document.addEventListener('dragover', function (event) {
+    if (isUploadArea(event.target)) {
+        event.preventDefault();
+    }
+});
+
+document.addEventListener('drop', function (event) {
+    if (isUploadArea(event.target)) {
+        event.preventDefault();
+        uploadCatalog(event.dataTransfer.files[0]);
+    }
+});
@@ -1,3 +1,4 @@
+import os
 import datetime
 import math
 from datetime import datetime as dt
@@ -9,17 +10,31 @@ import dash_core_components as dcc
 from dash.dependencies import Input, Output, State
 
 import dash
-from numba import njit, jit
-import networkx as nx
 import dash_bootstrap_components as dbc
 import plotly.graph_objects as go
 
-from app import app
+from app import app, catalog_cache
 from utils import earthquake_data
 from utils import session
+from utils import clustering
 from components.config import date_picker
 from components.config import cluster_config
 
+# Number of threads computing the clustering edges of a request, which can
+# also be set with the CLUSTER_THREADS environment variable. Half of the CPUs
+# by default, leaving the others to the requests of the other workers.
+CLUSTER_THREADS = int(os.environ.get(
+    'CLUSTER_THREADS', app.server.config.get(
+        'CLUSTER_THREADS', max(1, (os.cpu_count() or 1) // 2)
+    )
+))
+# Requests with more events than this are split over a pool of
+# CLUSTER_WORKERS processes, which share the CLUSTER_THREADS threads
+CLUSTER_CHUNK_EVENTS = app.server.config.get('CLUSTER_CHUNK_EVENTS', 10 ** 6)
+CLUSTER_WORKERS = app.server.config.get('CLUSTER_WORKERS', 1)
+# Number of thresholds in the graph of the number of clusters
+SWEEP_STEPS = 100
+
 
 def get_data(session_id):
     eq_data = earthquake_data.get_earthquake_data(session_id)
@@ -27,7 +42,7 @@ def get_data(session_id):
 
 
 def compute_edges(data):
-    """Return the list of edges to be used to build the clustering graph.
+    """Return the NeighbourEdges to be used to build the clustering graph.
 
     Keyword arguments:
     data -- numpy array holding the data (columns specified in compute_edges)
@@ -53,42 +68,41 @@ def compute_edges(data):
     vals[4, :] = lon
     vals = vals.T
 
-    new_df = pd.DataFrame(vals)
-    new_df.columns = ["DateTime", "EVENTID",
-                      "MAGNITUDE", "LATITUDE", "LONGITUDE"]
-
-    edges = compute_edges_numba(vals)
-    return edges, new_df
+    if CLUSTER_WORKERS > 1 and len(vals) > CLUSTER_CHUNK_EVENTS:
+        return clustering.get_neighbours_chunked(
+            vals, CLUSTER_WORKERS, max(1, CLUSTER_THREADS // CLUSTER_WORKERS)
+        )
+    return clustering.get_neighbours(vals, CLUSTER_THREADS)
 
 
-@jit(nopython=True)
-def compute_edges_numba(data):
-    """Return the list of edges to be used to build the clustering graph.
-    The edges are computed used numba compiler for infinite power
+def get_edges(session_id, start_date, end_date):
+    """Return the NeighbourEdges of the events between the given dates,
+    or None if there are no events. The edges are cached for the session
+    and the date range, so that changing only the threshold does not
+    compute them again.
 
     Keyword arguments:
-    data -- numpy array holding the data (columns specified in compute_edges)
+    session_id -- ID of the current session
+    start_date -- Datetime object for the start of the date range
+    end_date -- Datetime object for the end of the date range
     """
-    edges_numpy = np.zeros((len(data), 3))
-    for i in range(len(data)):
-        timestamp = data[i][0]
-        data2 = data[data[:, 0] < timestamp]
-        if len(data2) == 0:
+    data = earthquake_data.get_earthquake_data_by_dates(
+        session_id, start_date, end_date
+    )
+    if data.get_row_count() == 0:
+        return None
 
-            continue
-        time_diff = timestamp - data2[:, 0]
-        dist = np.zeros((len(data2)))
-        for k in range(len(data2)):
-            d = (data[i][3] - data2[k][3])**2 + (data[i][4] - data2[k][4])**2
-            dist[k] = d
-        dist = np.sqrt(dist)
-        x = time_diff*dist**(1.6)*(10**(-data[i][2]))
-        indx = np.argmin(x)
-        edges_numpy[i][0] = data2[indx][1]
-        edges_numpy[i][1] = data[i][1]
-        edges_numpy[i][2] = x[indx]
+    if data.table is None:
+        return compute_edges(data)
 
-    return edges_numpy
+    key = ('edges', start_date, end_date)
+    version = data.table.version
+    edges = catalog_cache.get(session_id, key, version)
+    if edges is None:
+        edges = compute_edges(data)
+        catalog_cache.set(session_id, key, version, edges)
+
+    return edges
 
 
 def get_component(session_id):
@@ -171,62 +185,92 @@ def callback_wrapper(n_clicks, threshold, start_date, end_date):
     end_date = dt.strptime(end_date,  "%Y-%m-%d") + datetime.timedelta(days=1)
 
     session_id = session.get_session_id()
-    data = get_data(session_id)
-    data = data.filter_by_dates(start_date, end_date)
-
-    df = data.data
-    if df.empty:
+    edges = get_edges(session_id, start_date, end_date)
+    if edges is None:
         return "No data"
     else:
-        edges, df = compute_edges(data)
-        figures = get_figures(edges, df, threshold)
+        figures = get_figures(edges, threshold)
 
-    graphs = []
+    graphs = [dcc.Graph(
+        id="sweep-fig", figure=get_sweep_figure(edges.get_sweep(), threshold)
+    )]
     for i, fig in enumerate(figures):
         graphs.append(dcc.Graph(id="fig-{}".format(i),  figure=fig))
     print("Done!")
     return graphs
 
 
-def get_figures(edges_np, df, th=1e-5):
+def get_sweep_figure(sweep, threshold):
+    """Return a plotly figure of the number of clusters and the size of
+    the largest cluster as a function of the threshold, with the given
+    threshold marked.
+
+    Keyword arguments:
+
+    sweep -- ThresholdSweep of the clustering graph
+    threshold -- The selected threshold
+   """
+    thresholds = sweep.get_thresholds(SWEEP_STEPS)
+    counts, largest = sweep.get_sweep(thresholds)
+
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(
+        x=thresholds, y=counts, mode='lines', name="Clusters"
+    ))
+    fig.add_trace(go.Scatter(
+        x=thresholds, y=largest, mode='lines', name="Largest cluster"
+    ))
+    fig.update_layout(
+        title={
+            "text": "Clusters by threshold",
+            "x": 0.5
+        },
+        xaxis_title="Threshold",
+        xaxis_type="log",
+        yaxis_title="Count",
+        shapes=[dict(
+            type="line", x0=threshold, x1=threshold, y0=0, y1=1,
+            yref="paper", line=dict(color='#0d35a5', dash="dash")
+        )]
+    )
+    return fig
+
+
+def get_figures(edges, th=1e-5):
     """Return list of plotly figures. One figure per cluster
 
     Keyword arguments:
 
-    edges_np -- numpy, result from the numba computation
-    df -- datetime , dataframe with the catalog
+    edges -- NeighbourEdges, the clustering edges of the catalog
     th -- Threshold for computing the weak edges.
    """
-    edges = []
-    for e in edges_np:
-        if e[0] == e[1]:
-            continue
-        edges.append((e[0], e[1],  {"w": e[2]}))
-
-    G = nx.DiGraph()
-    G.add_edges_from(edges)
-    # this threshold value is experimental and subject to changes.
-
-    to_remove = []
-    # this loop will remove the weak edges. weak edges are the ones
-    # with a distance above the threshold  defined above as th.
-    for e in G.edges:
-        w = G.edges[e]["w"]
-        if 1.0/(w + 1e-10) >= th:
-            to_remove.append((e[0], e[1]))
-    G.remove_edges_from(to_remove)
-    position_dict = compute_pos(df, G.nodes())
-
-    UG = G.to_undirected()
-    # extract the list of disjoint subgraphs
-    sub_graphs = [UG.subgraph(c) for c in nx.connected_components(UG)]
-
-    sub_graphs = [(g, len(g)) for g in sub_graphs]
-    sub_graphs = sorted_by_second = sorted(
-        sub_graphs, key=lambda tup: tup[1], reverse=True)
-    sub_graphs = [x[0] for x in sub_graphs]
-
-    figures = get_plots(sub_graphs, position_dict)
+    sweep = edges.get_sweep()
+    # the weak edges are the ones with a distance above the threshold,
+    # the clusters are the connected components of the other edges
+    labels, sizes = sweep.get_clusters(th)
+    sources, targets = sweep.get_kept_edges(th)
+    position_dict = compute_pos(edges.get_dataframe(), sweep.ids)
+
+    # the nodes of each cluster in the order of their first appearance
+    nodes = np.lexsort((sweep.ranks, labels))
+    node_stops = np.cumsum(sizes)
+    links = np.argsort(labels[sources], kind="stable")
+    link_stops = np.searchsorted(
+        labels[sources][links], np.arange(len(sizes)), side="right"
+    )
+
+    clusters = []
+    node_start = link_start = 0
+    for node_stop, link_stop in zip(node_stops, link_stops):
+        cluster_links = links[link_start:link_stop]
+        clusters.append((
+            sweep.ids[nodes[node_start:node_stop]],
+            zip(sweep.ids[sources[cluster_links]],
+                sweep.ids[targets[cluster_links]])
+        ))
+        node_start, link_start = node_stop, link_stop
+
+    figures = get_plots(clusters, position_dict)
     return figures
 
 
@@ -237,42 +281,46 @@ def compute_pos(df, nodes):
     Keyword arguments:
 
     df -- dataframe, the catalog
-    nodes -- list of nodes, result from G.nodes() with G being the networkx
-    graph constructed out of the edges computed.
+    nodes -- numpy array of the event IDs of the nodes
    """
+    # the first row of each event ID
+    ids, rows = np.unique(df["EVENTID"].to_numpy(), return_index=True)
+    rows = rows[np.searchsorted(ids, nodes)]
+
+    times = df["DateTime"].to_numpy()[rows]
+    magnitudes = df["MAGNITUDE"].to_numpy()[rows]
+    lats = df["LATITUDE"].to_numpy()[rows]
+    lons = df["LONGITUDE"].to_numpy()[rows]
+
     pos = {}
-    for n in nodes:
-        row = df[df["EVENTID"] == int(n)]
-        x = row["DateTime"].values[0]
-        x = dt(1970, 1, 1) + datetime.timedelta(seconds=x//10**9)
-        y = row["MAGNITUDE"].values[0]
-        lat = row["LATITUDE"].values[0]
-        lon = row["LONGITUDE"].values[0]
-        pos[n] = (x, y, lat, lon)
+    for i, n in enumerate(nodes):
+        x = dt(1970, 1, 1) + datetime.timedelta(seconds=times[i]//10**9)
+        pos[n] = (x, magnitudes[i], lats[i], lons[i])
     return pos
 
 
-def get_plots(graphs, positions):
+def get_plots(clusters, positions):
     """Return list of plotly figures.
 
     Keyword arguments:
 
-    graphs -- list, list of disjoint graphs
+    clusters -- list, the nodes and the links of each cluster
     positions -- dict, result from compute_pos
    """
     plots = []
-    for g in graphs:
-        fig = get_plot(g, positions)
+    for nodes, links in clusters:
+        fig = get_plot(nodes, links, positions)
         plots.append(fig)
     return plots
 
 
-def get_plot(graph, positions):
-    """Return plotly figure for a single graph
+def get_plot(nodes, links, positions):
+    """Return plotly figure for a single cluster
 
     Keyword arguments:
 
-    graph -- Networkx graph, list of disjoint graphs
+    nodes -- list, the event IDs of the cluster
+    links -- list, the pairs of event IDs linked in the cluster
     positions -- dict, result from compute_pos
    """
     Xe = []
@@ -289,7 +337,7 @@ def get_plot(graph, positions):
     max_magnitude = -1000
     max_time = 0.0
     hmshock = 0, 0
-    for n in graph:
+    for n in nodes:
         mag = positions[n][1]
         Xe.append(positions[n][0])
         Ye.append(positions[n][1])
@@ -302,7 +350,7 @@ Mag: {:.2f} <br> Time: {}""".format(
                 positions[n][2], positions[n][3], n,
                 positions[n][1], positions[n][0])
 
-    for n in graph:
+    for n in nodes:
         mag = positions[n][1]
         if mag == max_magnitude:
             # cont
@@ -326,7 +374,7 @@ Mag: {:.2f} <br> Time: {}""".format(
 
     fig = go.Figure()
     # Draw the edges
-    for e in graph.edges:
+    for e in links:
         n1 = e[0]
         n2 = e[1]
         x1, y1 = positions[n1][0], positions[n1][1]
@@ -41,20 +41,20 @@ def get_colors(data, color_params):
     is used to extract a color from a colormap.
 
     Keyword arguments:
-    data -- Dataframe object
+    data -- EarthquakeData object containing the filtered data
     color_params -- A tuple with the column name and its minimum
         and maximum values for extracting and normalizing values
         to use for colors
     """
 
     if color_params is None:
-        colors = np.repeat('red', data.shape[0])
+        colors = np.repeat('red', data.get_row_count())
         color_domain = None
 
     else:
         name, minimum, maximum = color_params
 
-        colors = data[name].copy()
+        colors = data.get_column(name).astype(float)
         color_domain = dict(
             domainMin=minimum,
             domainMax=maximum,
@@ -41,7 +41,7 @@ def get_sizes(data, column_params=None, is_map=True):
     filled with default values.
 
     Keyword arguments:
-    data -- Dataframe object containing the filtered data
+    data -- EarthquakeData object containing the filtered data
     column_params -- A tuple with the column name and its minimum
         and maximum values for extracting and normalizing values
         to use for sizes
@@ -51,11 +51,11 @@ def get_sizes(data, column_params=None, is_map=True):
         default_size = 200
         if not is_map:
             default_size = 10
-        return np.repeat(default_size, data.shape[0])
+        return np.repeat(default_size, data.get_row_count())
 
     name, minimum, maximum = column_params
 
-    sizes = data[name].astype(float).copy()
+    sizes = data.get_column(name).astype(float)
 
     sizes += 0.1 - minimum
     sizes /= (maximum - minimum + 0.1)
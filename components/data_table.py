@@ -14,7 +14,9 @@ def get_component(session_id):
 
     if eq_data is not None and eq_data.data.shape != (0, 0):
         return dcc.Loading(dash_table.DataTable(
-            data=eq_data.data.to_dict('records'),
+            data=earthquake_data.get_display_data(
+                eq_data.data
+            ).to_dict('records'),
             columns=[
                 {'name': i, 'id': i} for i in eq_data.data.columns
             ],
@@ -38,7 +38,7 @@ def get_component(eq_data, sizes, opacities, color_params=None,
     show_faults -- A boolean indicating whether to show the faults
     """
 
-    colors, color_domain = get_colors(eq_data.data, color_params)
+    colors, color_domain = get_colors(eq_data, color_params)
 
     return dl.Map(
         id='quake-map',
@@ -96,7 +96,9 @@ def get_event_layer(eq_data, sizes, colors, opacities):
                 className='earthquake-popup'
             )]
         )
-        for idx, quake in eq_data.data.reset_index().iterrows()]
+        for idx, quake in earthquake_data.get_display_data(
+            eq_data.data
+        ).reset_index().iterrows()]
 
     return dl.LayerGroup(id='layer-id', children=quake_circles)
 
@@ -109,11 +111,13 @@ def get_location_uncertainty_layer(eq_data, visible):
     visible -- A boolean indicating whether to display the uncertainties in
         location of each data point
     """
-    if eq_data.data.shape[0] == 0 or not visible:
+    if eq_data.get_row_count() == 0 or not visible:
         return dl.LayerGroup(id='location-uncertainties')
 
     location_uncertainties = eq_data.get_location_uncertainties()
-    reset_data = eq_data.data.reset_index()
+    reset_data = earthquake_data.get_display_data(
+        eq_data.data
+    ).reset_index()
     uncertainties = []
 
     if type(location_uncertainties) == int:
@@ -1,3 +1,5 @@
+from urllib.parse import parse_qs
+
 import dash_html_components as html
 import dash_core_components as dcc
 import dash_bootstrap_components as dbc
@@ -7,18 +9,23 @@ from utils import dataparser, earthquake_data
 from app import app
 
 SAMPLE_DATA_FILENAME = 'sc2018_hash_ABCD_so.focmec.scedc'
+# Route the files are streamed to by assets/upload.js
+UPLOAD_URL = '/upload-catalog'
 
 
 def get_component():
     """Return the uploader component."""
     return html.Div([
-        dcc.Upload(
+        html.Div(
             id='upload-data',
             children=html.Div([
                 'Drag and Drop or ',
-                html.A('Select Files')
+                html.A('Select Files'),
+                html.Span(id='upload-status')
             ])
         ),
+        # Set by assets/upload.js when a file has been uploaded
+        dcc.Input(id='upload-result', value='', style={'display': 'none'}),
         html.Div([
             html.Div(
                 dbc.Button(
@@ -35,38 +42,43 @@ def get_component():
     ])
 
 
-def update_output(contents, filename, session_id, use_sample_data=False):
+def update_output(search, session_id, use_sample_data=False):
     """Return a success or an error message depending on the success
     of parsing.
 
     Keyword arguments:
-    contents -- The contents of the uploaded file as a binary string
-    filename -- Name of the uploaded file
+    search -- Query string set by assets/upload.js in the upload-result
+    input after a file has been uploaded, containing the content hash of the
+    parsed catalog and the name of the file
     session_id -- ID of the current session
     use_sample_data -- Whether the sample data set should be used
     """
-    if use_sample_data:
-        filename = SAMPLE_DATA_FILENAME
+    try:
+        if use_sample_data:
+            filename = SAMPLE_DATA_FILENAME
+            dataparser.parse_sample_data(filename, session_id)
 
-    if contents is not None or use_sample_data:
-        try:
-            dataparser.parse_contents(
-                contents, filename, session_id, use_sample_data
-            )
-            eq_data = earthquake_data.get_earthquake_data(session_id)
+        else:
+            query = parse_qs(search.lstrip('?'))
+            filename = query.get('filename', [''])[0]
+            digest = query.get('catalog', [''])[0]
+            if not dataparser.is_session_catalog(session_id, digest):
+                raise Exception('Could not parse file: {}'.format(filename))
 
-            return dbc.Alert(
-                """File {} uploaded successfully, {} rows. Please select a tool
-                from the menu to inspect the data.
-                """.format(filename, eq_data.data.shape[0]),
-                color='success'
-            )
+        eq_data = earthquake_data.get_earthquake_data(session_id)
 
-        except Exception as ex:
-            print('Uploader:', ex)
-            return html.Div([
-                dbc.Alert(
-                    'The file could not be parsed, please try another one',
-                    color='danger'
-                )
-            ])
+        return dbc.Alert(
+            """File {} uploaded successfully, {} rows. Please select a tool
+            from the menu to inspect the data.
+            """.format(filename, eq_data.get_row_count()),
+            color='success'
+        )
+
+    except Exception as ex:
+        print('Uploader:', ex)
+        return html.Div([
+            dbc.Alert(
+                'The file could not be parsed, please try another one',
+                color='danger'
+            )
+        ])
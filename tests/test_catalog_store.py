@@ -0,0 +1,133 @@
+import os
+import json
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import catalog_store
+
+
+def get_catalog(data):
+    times = np.arange(len(data), dtype=np.int64)
+    return SimpleNamespace(
+        catalog_type='.scedc',
+        data=data,
+        times=times,
+        dates=pd.Series(times.view('datetime64[ns]'), name='DateTime'),
+        column_params={}
+    )
+
+
+@pytest.fixture
+def store(tmp_path):
+    return str(tmp_path / 'store')
+
+
+def test_save_catalog_text_columns(store):
+    rows = 1000
+    data = pd.DataFrame({
+        'TIME_UTC': ['2018-01-01T00:00:%06.3fZ' % (i / 100)
+                     for i in range(rows)],
+        'QUALITY': np.array(['A', 'B', 'C', 'ä'])[np.arange(rows) % 4],
+        'NOTE': [None if i % 2 else 'x%d' % i for i in range(rows)],
+        'MAGNITUDE': np.linspace(0, 5, rows)
+    })
+    path = os.path.join(store, 'catalogs', 'a')
+    catalog_store.save_catalog(path, get_catalog(data), store)
+
+    with open(os.path.join(path, catalog_store.MANIFEST_FILE)) as f:
+        columns = {c['name']: c for c in json.load(f)['columns']}
+    assert columns['TIME_UTC']['encoding'] == 'utf-8'
+    assert 'categories' not in columns['TIME_UTC']
+    assert len(columns['QUALITY']['categories']) == 4
+    assert 'categories' in columns['NOTE']
+
+    table = catalog_store.load_catalog(path)
+    pd.testing.assert_frame_equal(
+        table.get_frame(), data, check_dtype=False
+    )
+    assert list(table.get_column('TIME_UTC', slice(5, 7))) == \
+        list(data['TIME_UTC'][5:7])
+    assert list(table.get_column('QUALITY', np.array([3]))) == ['ä']
+
+
+@pytest.fixture
+def victim(tmp_path):
+    path = tmp_path / 'victim'
+    path.mkdir()
+    (path / 'keep').write_text('keep')
+    return path
+
+
+def test_link_catalog_replaces_link(store):
+    data = pd.DataFrame({'MAGNITUDE': [1.0, 2.0]})
+    session_path = os.path.join(store, 'sessions', 's')
+    for name in ['a', 'b']:
+        path = os.path.join(store, 'catalogs', name)
+        catalog_store.save_catalog(path, get_catalog(data), store)
+        catalog_store.link_catalog(session_path, path, store)
+
+        assert os.path.samefile(session_path, path)
+    assert catalog_store.catalog_exists(os.path.join(store, 'catalogs', 'a'))
+
+
+@pytest.mark.parametrize('name', ['../../victim', '../..', '..'])
+def test_paths_outside_store_are_refused(store, victim, name):
+    data = pd.DataFrame({'MAGNITUDE': [1.0, 2.0]})
+    shared_path = os.path.join(store, 'catalogs', 'a')
+    catalog_store.save_catalog(shared_path, get_catalog(data), store)
+    path = os.path.join(store, 'sessions', name)
+
+    with pytest.raises(Exception):
+        catalog_store.link_catalog(path, shared_path, store)
+    with pytest.raises(Exception):
+        catalog_store.save_catalog(path, get_catalog(data), store)
+    with pytest.raises(Exception):
+        catalog_store.remove_catalog(path, store)
+
+    assert (victim / 'keep').read_text() == 'keep'
+    assert catalog_store.catalog_exists(shared_path)
+
+
+def test_remove_catalog_outside_store_through_link(store, victim):
+    os.makedirs(os.path.join(store, 'sessions'))
+    link = os.path.join(store, 'sessions', 'link')
+    os.symlink(str(victim), link)
+
+    with pytest.raises(Exception):
+        catalog_store.remove_catalog(os.path.join(link, 'keep'), store)
+    catalog_store.remove_catalog(link, store)
+
+    assert not os.path.lexists(link)
+    assert (victim / 'keep').read_text() == 'keep'
+
+
+def test_candidate_rows_and_row_groups(store, monkeypatch):
+    monkeypatch.setattr(catalog_store, 'ROW_GROUP_SIZE', 4)
+    data = pd.DataFrame({
+        'LATITUDE': [60.0, 61, 60, 61, 10, 11, np.nan, 12, np.nan, np.nan],
+        'LONGITUDE': [20.0, 21, 22, 23, 20, 21, 22, 23, 24, 25]
+    })
+    path = os.path.join(store, 'catalogs', 'a')
+    catalog_store.save_catalog(path, get_catalog(data), store)
+    table = catalog_store.load_catalog(path)
+
+    np.testing.assert_array_equal(
+        table.zones['LATITUDE'], [[60, 10, np.nan], [61, 12, np.nan]]
+    )
+    bounds = {'LATITUDE': (59, 62), 'LONGITUDE': (21, 22)}
+    assert list(table.get_candidate_rows(bounds)) == [0, 1, 2, 3]
+    assert list(table.get_candidate_rows(bounds, slice(2, 9))) == [2, 3]
+    assert list(table.get_candidate_rows(
+        {'LATITUDE': (11, 60)}, np.array([0, 5, 9])
+    )) == [0, 5]
+    assert list(table.get_candidate_rows({'LATITUDE': (30, 40)})) == []
+
+    assert table.get_row_groups(slice(3, 9)) == \
+        [slice(3, 4), slice(4, 8), slice(8, 9)]
+    assert table.get_row_groups(slice(5, 5)) == []
+    assert [list(rows) for rows in table.get_row_groups(
+        np.array([0, 3, 4, 9])
+    )] == [[0, 3], [4], [9]]
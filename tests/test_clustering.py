@@ -0,0 +1,229 @@
+import numpy as np
+import pytest
+from numba import jit
+
+from utils.clustering import NeighbourEdges, ThresholdSweep, \
+    get_neighbours, get_neighbours_chunked
+
+
+@jit(nopython=True)
+def reference_edges(data):
+    """The exhaustive search that the spatial index replaced."""
+    edges_numpy = np.zeros((len(data), 3))
+    for i in range(len(data)):
+        timestamp = data[i][0]
+        data2 = data[data[:, 0] < timestamp]
+        if len(data2) == 0:
+            continue
+        time_diff = timestamp - data2[:, 0]
+        dist = np.zeros((len(data2)))
+        for k in range(len(data2)):
+            d = (data[i][3] - data2[k][3])**2 + (data[i][4] - data2[k][4])**2
+            dist[k] = d
+        dist = np.sqrt(dist)
+        x = time_diff*dist**(1.6)*(10**(-data[i][2]))
+        indx = np.argmin(x)
+        edges_numpy[i][0] = data2[indx][1]
+        edges_numpy[i][1] = data[i][1]
+        edges_numpy[i][2] = x[indx]
+
+    return edges_numpy
+
+
+def get_events(count, seed, grid=False, missing=False, shuffle=False):
+    """Return random events in the columns of get_neighbours.
+
+    Keyword arguments:
+    count -- Number of events
+    seed -- Seed of the random generator
+    grid -- Whether the times and locations are on a coarse grid, so that
+        many distances are tied
+    missing -- Whether some of the values are NaN
+    shuffle -- Whether the events are out of time order
+    """
+    rng = np.random.default_rng(seed)
+    data = np.zeros((count, 5))
+    if grid:
+        data[:, 0] = np.sort(rng.integers(0, count // 4, count))
+        data[:, 2] = rng.integers(1, 4, count)
+        data[:, 3] = rng.integers(60, 64, count)
+        data[:, 4] = rng.integers(20, 26, count)
+    else:
+        data[:, 0] = np.sort(rng.uniform(0, 1e9, count))
+        data[:, 2] = rng.uniform(-1, 5, count)
+        data[:, 3] = rng.normal(61, 2, count)
+        data[:, 4] = rng.normal(24, 4, count)
+    data[:, 1] = rng.permutation(count * 2)[:count]
+    if missing:
+        for column in [0, 2, 3, 4]:
+            data[rng.random(count) < 0.02, column] = np.nan
+    if shuffle:
+        data = data[rng.permutation(count)]
+    return data
+
+
+def reference_clusters(edges, threshold):
+    """The networkx connected components that ThresholdSweep replaced,
+    largest first and in the order networkx finds them otherwise.
+    """
+    nx = pytest.importorskip('networkx')
+    graph = nx.DiGraph()
+    graph.add_edges_from(
+        (edge[0], edge[1], {'w': edge[2]}) for edge in edges
+        if edge[0] != edge[1]
+    )
+    graph.remove_edges_from([
+        edge for edge in graph.edges
+        if 1.0 / (graph.edges[edge]['w'] + 1e-10) >= threshold
+    ])
+    components = nx.connected_components(graph.to_undirected())
+    return sorted([set(component) for component in components],
+                  key=len, reverse=True)
+
+
+def get_clusters(edges, threshold):
+    sweep = ThresholdSweep(edges)
+    labels, sizes = sweep.get_clusters(threshold)
+    clusters = [set(sweep.ids[labels == label])
+                for label in range(len(sizes))]
+    assert [len(cluster) for cluster in clusters] == list(sizes)
+    return clusters
+
+
+def get_random_edges(seed, count=300):
+    """Return random edges in the columns of NeighbourEdges.get_edges,
+    with NaN distances, rows without an earlier event and an edge
+    repeated with another distance.
+    """
+    rng = np.random.default_rng(seed)
+    ids = rng.permutation(count * 3)[:count].astype(float)
+    edges = np.zeros((count, 3))
+    edges[:, 0] = ids[rng.integers(0, count, count)]
+    edges[:, 1] = ids
+    edges[:, 2] = 10**rng.uniform(-4, 4, count)
+    edges[rng.random(count) < 0.05, 2] = np.nan
+    edges[:10] = 0
+    edges[-1] = edges[-2]
+    edges[-1, 2] = 1e-6
+    return edges
+
+
+def test_clusters_first_appearing_late():
+    # The pairs appear after more edges than there are nodes, and are
+    # ordered by their first appearance, not by their event IDs
+    edges = [[100.0, node, 1.0] for node in range(1, 11)]
+    edges += [[60.0, 61.0, 1.0], [50.0, 51.0, 1.0], [40.0, 41.0, 1.0]]
+    edges = np.array(edges)
+    assert get_clusters(edges, 1.0) == reference_clusters(edges, 1.0)
+    assert get_clusters(edges, 1.0)[1] == {60.0, 61.0}
+
+
+@pytest.mark.parametrize('seed', range(5))
+@pytest.mark.parametrize('threshold', [1e-3, 1.0, 1e3])
+def test_clusters_match_networkx(seed, threshold):
+    edges = get_random_edges(seed)
+    assert get_clusters(edges, threshold) == \
+        reference_clusters(edges, threshold)
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_sweep_matches_clusters(seed):
+    sweep = ThresholdSweep(get_random_edges(seed))
+    thresholds = sweep.get_thresholds(30)
+    assert len(thresholds) == 30
+    assert sweep.get_edge_count(thresholds[0]) == \
+        np.count_nonzero(np.isinf(sweep.keys))
+    assert sweep.get_edge_count(thresholds[-1]) == len(sweep.keys)
+
+    thresholds = np.random.default_rng(seed).permutation(thresholds)[::-1]
+    counts, largest = sweep.get_sweep(thresholds)
+    for threshold, count, size in zip(thresholds, counts, largest):
+        _, sizes = sweep.get_clusters(threshold)
+        assert (count, size) == (len(sizes), sizes.max())
+
+
+def test_sweep_last_edge_kept():
+    sweep = ThresholdSweep(np.array([[1.0, 2.0, 0.0], [2.0, 3.0, 1.0]]))
+    thresholds = sweep.get_thresholds(10)
+    counts, largest = sweep.get_sweep(thresholds)
+
+    assert (counts[0], largest[0]) == (3, 1)
+    assert (counts[-1], largest[-1]) == (1, 3)
+
+
+@pytest.mark.parametrize('edges', [np.zeros((0, 3)), np.zeros((5, 3))])
+def test_sweep_of_empty_graph(edges):
+    sweep = ThresholdSweep(edges)
+    thresholds = sweep.get_thresholds(30)
+    counts, largest = sweep.get_sweep(thresholds)
+
+    assert len(thresholds) == len(counts) == len(largest) == 0
+    assert counts.dtype == largest.dtype == np.int64
+    labels, sizes = sweep.get_clusters(1.0)
+    assert len(labels) == len(sizes) == 0
+
+
+def test_event_clusters():
+    # The event ID 20 appears twice with an edge, the event ID 30 once
+    # with an edge and once without, and the event ID 60 never has one
+    events = np.zeros((6, 5))
+    events[:, 1] = [10, 20, 30, 20, 60, 30]
+    parents = np.array([-1, 0, 1, 0, -1, -1])
+    distances = np.array([0, 10, 1e-3, 10, 0, 0])
+    edges = NeighbourEdges(events, parents, distances)
+    labels, sizes = edges.get_clusters(1.0)
+
+    np.testing.assert_array_equal(labels, [0, 0, 1, 0, -1, 1])
+    np.testing.assert_array_equal(sizes, [2, 1])
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_event_clusters_match_sweep(seed):
+    data = get_events(2000, seed, missing=True, shuffle=True)
+    data[-50:, 1] = data[:50, 1]
+    edges = get_neighbours(data)
+    labels, sizes = edges.get_clusters(1e-5)
+    sweep_labels, sweep_sizes = edges.get_sweep().get_clusters(1e-5)
+    node_labels = dict(zip(edges.get_sweep().ids, sweep_labels))
+
+    assert np.count_nonzero(labels == -1) > 0
+    np.testing.assert_array_equal(sizes, sweep_sizes)
+    np.testing.assert_array_equal(
+        labels, [node_labels.get(id, -1) for id in data[:, 1]]
+    )
+
+
+@pytest.mark.parametrize('grid', [False, True])
+@pytest.mark.parametrize('missing', [False, True])
+@pytest.mark.parametrize('shuffle', [False, True])
+def test_neighbours_match_exhaustive_search(grid, missing, shuffle):
+    data = get_events(2000, 0, grid, missing, shuffle)
+    np.testing.assert_array_equal(
+        get_neighbours(data).get_edges(), reference_edges(data)
+    )
+
+
+@pytest.mark.parametrize('column', [0, 2, 3, 4])
+def test_neighbours_with_missing_and_infinite_values(column):
+    rng = np.random.default_rng(column)
+    data = get_events(2000, column)
+    data[rng.random(len(data)) < 0.1, column] = np.nan
+    data[rng.integers(0, len(data), 3), column] = np.inf
+    data[rng.integers(0, len(data), 3), column] = -np.inf
+    np.testing.assert_array_equal(
+        get_neighbours(data).get_edges(), reference_edges(data)
+    )
+
+
+def test_neighbours_in_threads():
+    data = get_events(10000, 1, missing=True)
+    np.testing.assert_array_equal(
+        get_neighbours(data, threads=3).get_edges(), reference_edges(data)
+    )
+
+
+def test_neighbours_in_chunks():
+    data = get_events(3000, 2, grid=True, shuffle=True)
+    np.testing.assert_array_equal(
+        get_neighbours_chunked(data, 3).get_edges(), reference_edges(data)
+    )
@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+
+from utils.column_stats import (
+    QUANTILES, ColumnStats, GroupIndex, get_decimal_values, get_stats
+)
+
+
+@pytest.fixture
+def columns():
+    rng = np.random.default_rng(0)
+    templates = rng.integers(0, 20, 1000).astype(float)
+    templates[::7] = np.nan
+    return {'TEMPLATEID': templates, 'MAGNITUDE': rng.normal(size=1000)}
+
+
+@pytest.mark.parametrize('rows', [
+    None, slice(100, 600), np.arange(0, 1000, 3), np.array([], int)
+])
+def test_group_index_rows(columns, rows):
+    values = columns['TEMPLATEID']
+    index = GroupIndex(values)
+    positions = np.arange(len(values)) if rows is None else \
+        np.arange(len(values))[rows]
+
+    for value in [0, 5, 19, 20]:
+        expected = positions[values[positions] == value]
+        assert np.array_equal(index.get_rows(value, rows), expected)
+
+    expected = np.unique(values[positions][~np.isnan(values[positions])])
+    assert np.array_equal(index.get_values(rows), expected)
+
+
+def test_column_stats_memory_usage(columns):
+    stats = ColumnStats(columns.get, list(columns))
+    assert stats.get_memory_usage() == 0
+
+    index = stats.get_index('TEMPLATEID')
+    assert stats.get_index('TEMPLATEID') is index
+    assert stats.get_memory_usage() == \
+        index.keys.nbytes + index.groups.nbytes + index.values.nbytes
+
+
+def test_get_decimal_values():
+    rng = np.random.default_rng(0)
+    values = (rng.normal(size=10000) * 10.0 ** rng.integers(-8, 8, 10000))
+    values = np.r_[values, 0.04, 2.35, np.nan, np.inf, 0, 1e-40]
+    values = values.astype(np.float32)
+    expected = np.array([float(str(value)) for value in values])
+
+    np.testing.assert_array_equal(get_decimal_values(values), expected)
+
+
+def test_get_stats(columns):
+    values = columns['TEMPLATEID']
+    stats = get_stats(values)
+    present = values[~np.isnan(values)]
+
+    assert (stats['min'], stats['max']) == (present.min(), present.max())
+    assert stats['nulls'] == np.isnan(values).sum()
+    assert stats['distinct'] == len(np.unique(present))
+    np.testing.assert_allclose(
+        list(stats['quantiles'].values()), np.quantile(present, QUANTILES)
+    )
+
+
+def test_get_stats_float32_decimals():
+    stats = get_stats(np.array([0.04, 2.35, 2.35, np.nan], dtype=np.float32))
+
+    assert (stats['min'], stats['max']) == (0.04, 2.35)
+    assert stats['quantiles'][0.5] == 2.35
+    assert (stats['nulls'], stats['distinct']) == (1, 2)
+
+
+def test_get_stats_missing_values():
+    stats = get_stats(np.full(3, np.nan))
+
+    assert np.isnan([stats['min'], stats['max']]).all()
+    assert np.isnan(list(stats['quantiles'].values())).all()
+    assert (stats['nulls'], stats['distinct']) == (3, 0)
+
+
+def test_column_stats_computed_once(columns):
+    calls = []
+
+    def get_values(name):
+        calls.append(name)
+        return columns[name]
+
+    stats = ColumnStats(get_values, list(columns), {'MAGNITUDE': (-1, 1)})
+    assert stats.get_params('MAGNITUDE') == (-1, 1)
+    assert stats.get_stats('NOTE') is None
+    assert calls == []
+
+    column_stats = stats.get_stats('TEMPLATEID')
+    assert stats.get_params('TEMPLATEID') == \
+        (column_stats['min'], column_stats['max'])
+    assert stats.get_stats('TEMPLATEID') is column_stats
+    assert calls == ['TEMPLATEID']
@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.dateutils import get_datetime, get_datetimes
+
+
+@pytest.mark.parametrize('row', [
+    (2018, 1, 1, 0, 0, 0.0),
+    (2018, 12, 31, 23, 59, 59.999),
+    (2000, 2, 29, 12, 30, 15.25),
+    (2018, 5, 4, 10, 20, 60.5),
+    (2018, 5, 4, 10, 60, 1.0),
+    (1970, 1, 1, 0, 0, 0.0),
+    (1969, 12, 31, 23, 59, 59.5),
+    (1700, 6, 15, 8, 0, 0.0),
+    (2261, 12, 31, 0, 0, 0.0)
+])
+def test_get_datetimes_matches_get_datetime(row):
+    expected = pd.Timestamp(get_datetime(*row))
+    dates = get_datetimes(*[[value] for value in row])
+
+    assert pd.Timestamp(dates[0]) == expected
+
+
+def test_get_datetimes_missing_values():
+    dates = get_datetimes(
+        [2018, np.nan], [1, 1], [1, 1], [0, 0], [0, np.nan], [0, 0]
+    )
+
+    assert not np.isnat(dates[0])
+    assert np.isnat(dates[1])
+
+
+@pytest.mark.parametrize('year', [1000, 1610, 1677, 2263, 2500])
+def test_get_datetimes_outside_ns_range(year):
+    dates = get_datetimes([year], [1], [1], [0], [0], [0])
+
+    assert dates.dtype == np.dtype('datetime64[ns]')
+    assert np.isnat(dates[0])
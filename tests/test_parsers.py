@@ -0,0 +1,164 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.parsers import fencat_parse, fm_parse, generic_parse, \
+    parse_chunked, qtm_parse
+
+FENCAT_NAMES = [
+    'SOURCE', 'QUESTIONABLE ORIGIN', 'YEAR', 'MONTH', 'DAY', 'STATUS',
+    'HOUR', 'MINUTE', 'SECOND', 'LATITUDE', 'LONGITUDE',
+    'TIME UNCERTAINTY', 'LOCATION UNCERTAINTY', 'DEPTH',
+    'DEPTH ID CODE', 'MAGNITUDE', 'MAG SCALE', 'MAGNITUDE2',
+    'MAG2 SCALE', 'MAGNITUDE3', 'MAG3 SCALE', 'MAX INTENSITY',
+    'INTENSITY STATUS', 'MACROSEISMIC REF', 'MEAN RADIUS', 'REGION',
+    'NUM STATIONS', 'MAX AZIMUTH GAP', 'MIN STATION DIST'
+]
+
+
+def reference_fencat_parse(contents):
+    """The row by row FENCAT parser that fencat_parse replaced."""
+    def get_fields(row):
+        return [
+            row[:3], row[3], row[4:8], row[8:10], row[10:12], row[12],
+            row[13:15], row[15:17], row[17:21], row[21:28], row[28:36],
+            row[36], row[37], row[38:41], row[41], row[42:45], row[45:47],
+            row[47:50], row[50:52], row[52:55], row[55:57], row[66:70],
+            row[70], row[71:74], row[74:77], row[77]
+        ]
+
+    rows = list(map(
+        lambda row: '\t'.join(get_fields(row) + ['', '', '']),
+        filter(lambda r: len(r.strip()) == 78, contents.split('\n'))
+    ))
+    rows.extend(list(map(
+        lambda row: '\t'.join(
+            get_fields(row) + [row[78:82], row[83:86], row[86:]]
+        ),
+        filter(lambda r: len(r.strip()) == 91, contents.split('\n'))
+    )))
+
+    return pd.read_table(
+        io.StringIO('\n'.join(rows)),
+        sep='\t',
+        names=FENCAT_NAMES,
+        na_values=['  ', '   ', '    ']
+    ).reset_index().rename(columns={'index': 'ID'})
+
+
+def get_row(rng, long_row, blanks):
+    def blank(text):
+        return ' ' * len(text) if rng.random() < blanks else text
+
+    row = (
+        rng.choice(['FIN', 'SWE', 'NOR']) + rng.choice([' ', '?'])
+        + '%4d%02d%02d' % (rng.integers(1500, 2020), rng.integers(1, 13),
+                           rng.integers(1, 29))
+        + rng.choice(['P', 'M'])
+        + blank('%02d%02d' % (rng.integers(0, 24), rng.integers(0, 60)))
+        + blank('%4.1f' % rng.uniform(0, 59.9))
+        + '%7.3f%8.3f' % (rng.uniform(55, 70), rng.uniform(-10, 35))
+        + rng.choice(list('ABC ')) + rng.choice(list('ABC?'))
+        + blank('%3d' % rng.integers(0, 40)) + rng.choice(list('FN '))
+        + blank('%3.1f' % rng.uniform(0, 5)) + blank(rng.choice(['ML', 'MW']))
+        + blank('%3.1f' % rng.uniform(0, 5)) + blank('MD')
+        + blank('%3.1f' % rng.uniform(0, 5)) + blank('MS')
+        + ' ' * 9 + blank('%4.1f' % rng.uniform(1, 9)) + rng.choice(list('AB'))
+        + blank('%3d' % rng.integers(0, 999))
+        + blank('%3d' % rng.integers(0, 999)) + rng.choice(list('ABCDEF'))
+    )
+    if long_row:
+        row += (
+            blank('%4d' % rng.integers(0, 200)) + ' '
+            + blank('%3d' % rng.integers(0, 360))
+            + '%5.1f' % rng.uniform(0, 999)
+        )
+    return row
+
+
+@pytest.mark.parametrize('seed', range(4))
+@pytest.mark.parametrize('blanks', [0.0, 0.3])
+@pytest.mark.parametrize('binary', [False, True])
+def test_fencat_parse_matches_reference(seed, blanks, binary):
+    rng = np.random.default_rng(seed)
+    rows = [get_row(rng, rng.random() < 0.5, blanks) for _ in range(200)]
+    rows += ['', 'header line', ' ' * 78]
+    order = rng.permutation(len(rows))
+    contents = '\n'.join(np.array(rows)[order]) + '\n'
+
+    expected = reference_fencat_parse(contents)
+    assert len(expected) == 200
+    parsed = fencat_parse(
+        io.BytesIO(contents.encode('utf-8')) if binary else contents
+    )
+
+    pd.testing.assert_frame_equal(parsed, expected)
+
+
+def get_generic_rows(rng, count):
+    """Return rows of a generic catalog whose IDs are numbers with leading
+    zeros in the first half and text in the second half.
+    """
+    return [
+        '{},{},{},{},{},{},{:.2f},{:.1f},{},{:.4f},{:.4f}'.format(
+            '%05d' % idx if idx < count // 2 else 'ev%d' % idx,
+            rng.integers(1990, 2020), rng.integers(1, 13),
+            rng.integers(1, 29), rng.integers(0, 24), rng.integers(0, 60),
+            rng.uniform(0, 60), rng.uniform(0, 20),
+            # Magnitudes are only missing near the end
+            '' if idx > count - 50 and idx % 7 == 0
+            else '%.1f' % rng.uniform(0, 5),
+            rng.uniform(30, 40), rng.uniform(-120, -110)
+        )
+        for idx in range(count)
+    ]
+
+
+def get_fm_rows(rng, count):
+    """Return rows of an FM catalog whose quality is a letter only in the
+    second half.
+    """
+    return [
+        ' '.join(
+            [str(value) for value in rng.integers(1, 28, 5)]
+            + ['%.2f' % rng.uniform(0, 60), str(idx)]
+            + ['%.3f' % value for value in rng.uniform(0, 90, 13)]
+            + ['A' if idx >= count // 2 else str(idx % 3)]
+        )
+        for idx in range(count)
+    ]
+
+
+def get_qtm_rows(rng, count):
+    """Return a header and rows of a QTM catalog with a cluster ID that is
+    missing only in the first half.
+    """
+    return ['YEAR MONTH DAY EVENTID LATITUDE LONGITUDE MAGNITUDE CLUSTER'] + [
+        '{} {} {} {} {:.5f} {:.5f} {:.2f} {}'.format(
+            rng.integers(1981, 2020), rng.integers(1, 13),
+            rng.integers(1, 29), idx, rng.uniform(32, 37),
+            rng.uniform(-121, -114), rng.uniform(0, 5),
+            'NaN' if idx < count // 2 else rng.integers(0, 100)
+        )
+        for idx in range(count)
+    ]
+
+
+@pytest.mark.parametrize('parser, get_rows, header_lines', [
+    (generic_parse, get_generic_rows, 0),
+    (fm_parse, get_fm_rows, 0),
+    (qtm_parse, get_qtm_rows, 1)
+])
+def test_parse_chunked_matches_single_pass(tmp_path, parser, get_rows,
+                                           header_lines):
+    path = str(tmp_path / 'catalog')
+    with open(path, 'w') as f:
+        f.write('\n'.join(get_rows(np.random.default_rng(0), 4000)) + '\n')
+
+    with open(path, 'rb') as f:
+        expected = parser(f)
+    parsed = parse_chunked(parser, path, header_lines, 40000, 2)
+
+    pd.testing.assert_frame_equal(parsed, expected)
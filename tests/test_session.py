@@ -0,0 +1,51 @@
+import uuid
+
+import pytest
+from flask import Flask
+
+from utils import session
+
+app = Flask(__name__)
+
+
+def get_cookie_session_id(value):
+    headers = {'Cookie': '{}={}'.format(session.SESSION_COOKIE, value)}
+    with app.test_request_context(headers=headers):
+        return session.get_session_id()
+
+
+def test_get_session_id_valid():
+    session_id = str(uuid.uuid4())
+
+    assert get_cookie_session_id(session_id) == session_id
+
+
+@pytest.mark.parametrize('value', [
+    '../../../victim',
+    'a/b',
+    '..',
+    '',
+    str(uuid.uuid4()).upper(),
+    '{%s}' % uuid.uuid4(),
+    str(uuid.uuid4()) + '/..'
+])
+def test_get_session_id_invalid(value):
+    assert get_cookie_session_id(value) is None
+
+
+def test_get_session_id_missing():
+    with app.test_request_context():
+        assert session.get_session_id() is None
+
+
+def test_generate_request_session_id():
+    @app.route('/new-session')
+    def new_session():
+        return session.generate_request_session_id()
+
+    response = app.test_client().get('/new-session')
+    session_id = response.get_data(as_text=True)
+
+    assert session.is_session_id(session_id)
+    assert '{}={}'.format(session.SESSION_COOKIE, session_id) in \
+        response.headers['Set-Cookie']
@@ -0,0 +1,98 @@
+import threading
+from collections import OrderedDict
+
+
+class CatalogCache:
+    """In-process cache of session catalogs.
+
+    The cached catalogs are backed by memory mapped files of the catalog
+    store, so every worker process maps the same read-only pages and a
+    cache hit returns the cached object itself, without copying or
+    unpickling anything. Each entry is saved with the version of the stored
+    catalog it was loaded from and is dropped once the version no longer
+    matches, for example after another worker has saved a new upload.
+
+    Entries are grouped in namespaces. Catalogs are cached under the real
+    path of their stored catalog, so that sessions referring to the same
+    shared catalog share one entry, and the views derived from a catalog
+    for a session are cached under the session ID. The least recently used
+    entries are evicted when the memory held by the cached values exceeds
+    the byte budget.
+    """
+
+    def __init__(self, max_bytes):
+        """Create an empty cache.
+
+        Keyword arguments:
+        max_bytes -- Memory budget of the cached values in bytes
+        """
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, namespace, key, version):
+        """Return the cached value for the given key, or None if there is
+        no value cached for the given version.
+
+        Keyword arguments:
+        namespace -- Namespace of the entry, a session ID or the path of
+            a stored catalog
+        key -- Key of the entry within the namespace
+        version -- Version of the stored catalog
+        """
+        with self.lock:
+            entry = self.entries.get((namespace, key))
+            if entry is None:
+                return None
+
+            if entry[0] != version:
+                del self.entries[(namespace, key)]
+                return None
+
+            self.entries.move_to_end((namespace, key))
+            return entry[1]
+
+    def set(self, namespace, key, version, value):
+        """Cache the given value and evict the least recently used entries
+        if the byte budget is exceeded.
+
+        Keyword arguments:
+        namespace -- Namespace of the entry, a session ID or the path of
+            a stored catalog
+        key -- Key of the entry within the namespace
+        version -- Version of the stored catalog the value is derived from
+        value -- Value to cache, an object with a get_memory_usage method
+        """
+        with self.lock:
+            self.entries[(namespace, key)] = (version, value)
+            self.entries.move_to_end((namespace, key))
+            self.evict()
+
+    def delete_namespace(self, namespace):
+        """Remove all entries of the given namespace.
+
+        Keyword arguments:
+        namespace -- Namespace to remove, usually the session ID
+        """
+        with self.lock:
+            for entry_key in list(self.entries):
+                if entry_key[0] == namespace:
+                    del self.entries[entry_key]
+
+    def get_memory_usage(self):
+        """Return the number of bytes held by the cached values."""
+        return sum(
+            value.get_memory_usage() for _, value in self.entries.values()
+        )
+
+    def evict(self):
+        """Remove least recently used entries until the cached values fit
+        in the byte budget. The most recently used entry is always kept.
+
+        The sizes are computed again on every eviction, because cached
+        catalogs build their dataframes lazily after being cached.
+        """
+        usage = self.get_memory_usage()
+        while usage > self.max_bytes and len(self.entries) > 1:
+            _, (_, value) = self.entries.popitem(last=False)
+            usage -= value.get_memory_usage()
@@ -0,0 +1,473 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import threading
+
+import numpy as np
+import pandas as pd
+
+MANIFEST_FILE = 'manifest.json'
+TIMES_FILE = 'times.npy'
+COLUMN_FILE = '%d.npy'
+# Text columns are saved as categories if at most this fraction of their
+# values are distinct, and as UTF-8 encoded fixed-width strings otherwise,
+# so that columns unique per row do not put every value in the manifest.
+MAX_CATEGORY_RATIO = 0.1
+# Number of rows summarized by one entry of the zone maps. The rows are
+# sorted by time, so each row group covers a contiguous time range.
+ROW_GROUP_SIZE = 16384
+
+
+def catalog_exists(path):
+    """Return boolean indicating whether a catalog is stored in the given
+    directory.
+
+    Keyword arguments:
+    path -- Directory of the stored catalog
+    """
+    return os.path.exists(os.path.join(path, MANIFEST_FILE))
+
+
+def save_catalog(path, catalog, root):
+    """Save the given catalog to the given directory in a columnar format,
+    replacing any catalog already stored there.
+
+    Each column is saved as a typed numpy array in its own file, and a
+    manifest holds the column names, dtypes, the catalog type and the
+    column parameters. String columns with few distinct values are saved
+    as integer codes, with the distinct values kept in the manifest, and
+    other string columns as UTF-8 encoded bytes. For each numeric column
+    the manifest also holds a zone map, the minimum and maximum of every
+    ROW_GROUP_SIZE rows, so that range filters can skip row groups.
+
+    Keyword arguments:
+    path -- Directory to save the catalog to
+    catalog -- EarthquakeData object to save
+    root -- Directory of the catalog store, see check_path
+    """
+    check_path(path, root)
+    temp_path = '%s.%s.tmp' % (path, uuid.uuid4().hex)
+    os.makedirs(temp_path)
+
+    columns = []
+    zones = {}
+    for idx, name in enumerate(catalog.data.columns):
+        column = catalog.data[name]
+        manifest_column = {
+            'name': name,
+            'file': COLUMN_FILE % idx,
+            'dtype': str(column.dtype)
+        }
+
+        if column.dtype.kind not in 'biufcmM':
+            if is_text(column) and column.nunique() > \
+                    MAX_CATEGORY_RATIO * len(column):
+                manifest_column['encoding'] = 'utf-8'
+                column = column.str.encode('utf-8')
+            else:
+                column = column.astype('category')
+        if 'encoding' in manifest_column:
+            values = column.to_numpy().astype(bytes)
+        elif column.dtype.name == 'category':
+            manifest_column['categories'] = \
+                column.cat.categories.to_numpy().tolist()
+            values = column.cat.codes.to_numpy()
+        else:
+            values = column.to_numpy()
+            if values.dtype.kind in 'biuf':
+                zones[name] = get_zones(values)
+
+        np.save(os.path.join(temp_path, manifest_column['file']), values)
+        columns.append(manifest_column)
+
+    np.save(os.path.join(temp_path, TIMES_FILE), catalog.times)
+
+    manifest = {
+        'catalog_type': getattr(
+            catalog.catalog_type, 'value', catalog.catalog_type
+        ),
+        'rows': catalog.data.shape[0],
+        'dates': catalog.dates.name,
+        'columns': columns,
+        'column_params': {
+            name: [get_json_value(value) for value in params]
+            for name, params in catalog.column_params.items()
+        },
+        'zones': zones
+    }
+    with open(os.path.join(temp_path, MANIFEST_FILE), 'w') as file_out:
+        json.dump(manifest, file_out)
+
+    replace_path(temp_path, path, root)
+
+
+def link_catalog(path, catalog_path, root):
+    """Make the given path refer to the catalog stored in another directory,
+    replacing any catalog or link at the path. The catalog is shared, not
+    copied.
+
+    Keyword arguments:
+    path -- Path of the link, for example the catalog path of a session
+    catalog_path -- Directory of the shared catalog
+    root -- Directory of the catalog store, see check_path
+    """
+    check_path(path, root)
+    check_path(catalog_path, root)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = '%s.%s.tmp' % (path, uuid.uuid4().hex)
+    os.symlink(
+        os.path.relpath(catalog_path, os.path.dirname(path)), temp_path
+    )
+    replace_path(temp_path, path, root)
+
+
+def replace_path(temp_path, path, root):
+    """Move a newly saved catalog or link to the given path, replacing the
+    catalog or link that is there.
+
+    Keyword arguments:
+    temp_path -- Path of the new catalog or link
+    path -- Path to move it to
+    root -- Directory of the catalog store, see check_path
+    """
+    check_path(path, root)
+    if os.path.islink(temp_path) and os.path.islink(path) or \
+            not os.path.lexists(path):
+        os.replace(temp_path, path)
+        return
+
+    # Catalogs replaced here may still be mapped by other processes. The
+    # mappings stay valid after the files have been removed.
+    old_path = '%s.%s.old' % (path, uuid.uuid4().hex)
+    os.rename(path, old_path)
+    os.rename(temp_path, path)
+    remove_catalog(old_path, root)
+
+
+class StoredCatalog:
+    """Memory mapped columns of a catalog saved in the catalog store.
+
+    The column files are mapped read-only, so every process that loads the
+    same catalog shares the same pages of the OS page cache. Rows are only
+    copied out of the mapped files when a dataframe is built from them.
+    """
+
+    def __init__(self, path):
+        """Read the manifest and map the column files of the catalog.
+
+        Keyword arguments:
+        path -- Directory of the stored catalog
+        """
+        with open(os.path.join(path, MANIFEST_FILE), 'r') as file_in:
+            manifest = json.load(file_in)
+
+        self.path = path
+        self.version = get_version(path)
+        self.catalog_type = manifest['catalog_type']
+        self.dates_name = manifest['dates']
+        self.columns = manifest['columns']
+        self.names = [column['name'] for column in self.columns]
+        self.arrays = {
+            column['name']: np.load(
+                os.path.join(path, column['file']), mmap_mode='r'
+            )
+            for column in self.columns
+        }
+        self.categories = {
+            column['name']: pd.Index(column['categories'])
+            for column in self.columns if 'categories' in column
+        }
+        self.encodings = {
+            column['name']: column['encoding']
+            for column in self.columns if 'encoding' in column
+        }
+        self.times = np.load(os.path.join(path, TIMES_FILE), mmap_mode='r')
+        self.column_params = {
+            name: tuple(params)
+            for name, params in manifest['column_params'].items()
+        }
+        # Catalogs saved without zone maps have none, and all of their rows
+        # are candidates of every range
+        self.zones = {
+            name: np.array(zone, dtype=float)
+            for name, zone in manifest.get('zones', {}).items()
+        }
+
+    def get_column(self, name, rows=None):
+        """Return the values of the given column for the given rows.
+
+        Keyword arguments:
+        name -- Name of the column
+        rows -- A slice or an array of row positions, or None for all rows
+        """
+        values = self.arrays[name]
+        if rows is not None:
+            values = values[rows]
+
+        if name in self.categories:
+            values = pd.Categorical.from_codes(
+                values, self.categories[name]
+            )
+            if self.get_dtype(name) != 'category':
+                values = np.asarray(values, dtype=object)
+        elif name in self.encodings:
+            encoding = self.encodings[name]
+            values = np.array(
+                [value.decode(encoding) for value in values.tolist()],
+                dtype=object
+            )
+
+        return values
+
+    def get_dtype(self, name):
+        """Return the dtype of the given column as a string.
+
+        Keyword arguments:
+        name -- Name of the column
+        """
+        return self.columns[self.names.index(name)]['dtype']
+
+    def get_frame(self, rows=None):
+        """Return a pandas dataframe containing the given rows.
+
+        Keyword arguments:
+        rows -- A slice or an array of row positions, or None for all rows
+        """
+        return pd.DataFrame(
+            {name: self.get_column(name, rows) for name in self.names},
+            columns=self.names
+        )
+
+    def get_candidate_rows(self, ranges, rows=None):
+        """Return the sorted positions of the given rows that are in row
+        groups whose zone maps overlap all of the given ranges. Rows outside
+        the returned positions cannot have values within the ranges, so only
+        the returned rows need to be read to filter by the ranges.
+
+        Keyword arguments:
+        ranges -- Dictionary of numeric column names and (low, high) tuples
+            of inclusive bounds
+        rows -- A slice or a sorted array of row positions, or None for
+            all rows
+        """
+        if rows is None:
+            rows = slice(0, len(self.times))
+
+        # Groups with only missing values have NaN bounds and never match
+        overlaps = np.ones(-(-len(self.times) // ROW_GROUP_SIZE), dtype=bool)
+        for name, (low, high) in ranges.items():
+            zone = self.zones.get(name)
+            if zone is not None:
+                overlaps &= (zone[1] >= low) & (zone[0] <= high)
+
+        if not isinstance(rows, slice):
+            return rows[overlaps[rows // ROW_GROUP_SIZE]]
+
+        first = rows.start // ROW_GROUP_SIZE
+        last = -(-rows.stop // ROW_GROUP_SIZE)
+        groups = first + np.flatnonzero(overlaps[first:last])
+        return np.concatenate([np.array([], dtype=np.int64)] + [
+            np.arange(
+                max(rows.start, group * ROW_GROUP_SIZE),
+                min(rows.stop, (group + 1) * ROW_GROUP_SIZE)
+            )
+            for group in groups
+        ])
+
+    def get_row_groups(self, rows=None):
+        """Return a list of the given rows split by row group, so that a
+        column can be read one row group at a time.
+
+        Keyword arguments:
+        rows -- A slice or a sorted array of row positions, or None for
+            all rows
+        """
+        if rows is None:
+            rows = slice(0, len(self.times))
+
+        if isinstance(rows, slice):
+            if rows.start >= rows.stop:
+                return []
+            starts = range(
+                rows.start - rows.start % ROW_GROUP_SIZE, rows.stop,
+                ROW_GROUP_SIZE
+            )
+            return [
+                slice(max(rows.start, start),
+                      min(rows.stop, start + ROW_GROUP_SIZE))
+                for start in starts
+            ]
+
+        groups = rows // ROW_GROUP_SIZE
+        bounds = np.flatnonzero(groups[1:] != groups[:-1]) + 1
+        return np.split(rows, bounds) if len(rows) > 0 else []
+
+
+def load_catalog(path):
+    """Return a StoredCatalog for the catalog stored in the given directory.
+    The column files are memory mapped, so no parsing is needed.
+
+    Keyword arguments:
+    path -- Directory of the stored catalog
+    """
+    return StoredCatalog(path)
+
+
+def get_version(path):
+    """Return a value identifying the catalog currently stored in the given
+    directory, or None if there is no catalog. The value changes whenever
+    a new catalog is saved to the directory.
+
+    Keyword arguments:
+    path -- Directory of the stored catalog
+    """
+    try:
+        stat = os.stat(os.path.join(path, MANIFEST_FILE))
+    except FileNotFoundError:
+        return None
+
+    return stat.st_ino, stat.st_mtime_ns
+
+
+def remove_catalog(path, root):
+    """Remove the catalog stored in the given directory, if any. If the
+    path is a link to a shared catalog, only the link is removed.
+
+    Keyword arguments:
+    path -- Directory of the stored catalog
+    root -- Directory of the catalog store, see check_path
+    """
+    check_path(path, root)
+    if os.path.islink(path) or os.path.isfile(path):
+        os.remove(path)
+    elif os.path.exists(path):
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def touch_catalog(path):
+    """Mark the catalog stored in the given directory as used now, so that
+    it is not removed as expired. If the path is a link to a shared
+    catalog, both the link and the shared catalog are marked.
+
+    Keyword arguments:
+    path -- Directory of the stored catalog
+    """
+    try:
+        os.utime(path)
+        if os.path.islink(path):
+            os.utime(path, follow_symlinks=False)
+    except FileNotFoundError:
+        pass
+
+
+def remove_expired_catalogs(directory, ttl, root):
+    """Remove the catalogs in the given directory that have not been used
+    within the given time, as well as leftovers of interrupted saves and
+    uploads.
+
+    Keyword arguments:
+    directory -- Directory containing the stored catalogs
+    ttl -- Time to live of an unused catalog in seconds
+    root -- Directory of the catalog store, see check_path
+    """
+    if not os.path.exists(directory):
+        return
+
+    now = time.time()
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        try:
+            last_used = os.lstat(path).st_mtime
+        except FileNotFoundError:
+            continue
+
+        if now - last_used > ttl:
+            remove_catalog(path, root)
+
+
+def start_sweeper(directories, ttl, interval, root):
+    """Start a background thread that periodically removes the expired
+    catalogs in the given directories.
+
+    Keyword arguments:
+    directories -- List of directories containing stored catalogs
+    ttl -- Time to live of an unused catalog in seconds
+    interval -- Time between two sweeps in seconds
+    root -- Directory of the catalog store, see check_path
+    """
+    def sweep():
+        while True:
+            time.sleep(interval)
+            try:
+                for directory in directories:
+                    remove_expired_catalogs(directory, ttl, root)
+            except Exception as ex:
+                print(os.path.basename(__file__), ':', ex)
+
+    sweeper = threading.Thread(target=sweep, daemon=True)
+    sweeper.start()
+    return sweeper
+
+
+def check_path(path, root):
+    """Raise an exception if the given path is not inside the directory
+    of the catalog store. Every path is checked before anything is saved,
+    replaced or removed at it, so that a path built from a session ID or
+    another request value can never touch files outside the store.
+
+    The last component of the path is not followed if it is a link, so the
+    link of a session can be replaced, but not the catalog it refers to.
+
+    Keyword arguments:
+    path -- Path to check
+    root -- Directory of the catalog store
+    """
+    root = os.path.realpath(root)
+    location = os.path.normpath(os.path.join(
+        os.path.realpath(os.path.dirname(path)), os.path.basename(path)
+    ))
+    if location == root or os.path.commonpath([root, location]) != root:
+        raise Exception('Path outside the catalog store: {}'.format(path))
+
+
+def get_zones(values):
+    """Return the zone map of a column as a list of the minimums and a
+    list of the maximums of each row group. Missing values are ignored,
+    and a group with only missing values has NaN bounds.
+
+    Keyword arguments:
+    values -- Numpy array of the values of the column
+    """
+    if len(values) == 0:
+        return [[], []]
+
+    starts = np.arange(0, len(values), ROW_GROUP_SIZE)
+    return [
+        np.fmin.reduceat(values, starts).astype(float).tolist(),
+        np.fmax.reduceat(values, starts).astype(float).tolist()
+    ]
+
+
+def is_text(column):
+    """Return boolean indicating whether the given column only contains
+    strings, with no missing values.
+
+    Keyword arguments:
+    column -- Pandas Series of the column
+    """
+    return column.notna().all() and \
+        pd.api.types.infer_dtype(column) == 'string'
+
+
+def get_json_value(value):
+    """Convert a numpy scalar to the corresponding Python value so that it
+    can be saved in the manifest.
+
+    Keyword arguments:
+    value -- Value to convert
+    """
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
@@ -0,0 +1,758 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from numba import njit
+
+# Maximum number of events in a leaf of the spatial index
+LEAF_SIZE = 32
+# The lower bounds used for pruning are scaled down by this factor, so that
+# the rounding of the power function can never prune the nearest neighbour
+BOUND_MARGIN = 1 - 1e-9
+# Order of an event that comes after every event of the data
+LAST_ORDER = np.iinfo(np.int64).max
+# Number of events looked up by one task of a thread pool
+TASK_EVENTS = 4096
+# Added to the distances before inverting them in the weak edge test
+DISTANCE_OFFSET = 1e-10
+
+
+class NeighbourEdges:
+    """Edges of the nearest-neighbour clustering graph of a set of events.
+
+    Each event has at most one edge, from its nearest earlier neighbour,
+    so the edges are kept as two arrays with the row of the neighbour and
+    the distance of each event. Together with the events they take a few
+    dozen bytes per event and can be cached, for example to cut the graph
+    again at another threshold.
+    """
+
+    # Columns of the events array
+    COLUMNS = ['DateTime', 'EVENTID', 'MAGNITUDE', 'LATITUDE', 'LONGITUDE']
+
+    def __init__(self, events, parents, distances):
+        """Create an object holding the given edges.
+
+        Keyword arguments:
+        events -- numpy array with a row for each event and columns for the
+            time, event ID, magnitude, latitude and longitude
+        parents -- Row of the nearest neighbour of each event, or -1 if
+            there are no earlier events
+        distances -- Nearest-neighbour distance of each event, 0 if there
+            are no earlier events
+        """
+        self.events = events
+        self.parents = parents
+        self.distances = distances
+        self.sweep = None
+
+    def get_edges(self):
+        """Return the edges as an array with a row for each event, holding
+        the event ID of its nearest neighbour, its own event ID and the
+        distance between them. The rows of events with no earlier events
+        are zeros.
+        """
+        edges = np.zeros((len(self.events), 3))
+        found = self.parents >= 0
+        edges[found, 0] = self.events[self.parents[found], 1]
+        edges[found, 1] = self.events[found, 1]
+        edges[found, 2] = self.distances[found]
+        return edges
+
+    def get_clusters(self, threshold):
+        """Return the cluster of each event at the given threshold, or -1
+        for events without edges, and the number of distinct event IDs in
+        each cluster, see ThresholdSweep.get_clusters.
+
+        Keyword arguments:
+        threshold -- Threshold for computing the weak edges
+        """
+        sweep = self.get_sweep()
+        labels, sizes = sweep.get_clusters(threshold)
+        event_labels = np.full(len(self.events), -1, np.int64)
+        if len(sweep.ids) == 0:
+            return event_labels, sizes
+
+        ids = self.events[:, 1]
+        nodes = np.searchsorted(sweep.ids, ids).clip(max=len(sweep.ids) - 1)
+        linked = sweep.ids[nodes] == ids
+        event_labels[linked] = labels[nodes[linked]]
+        return event_labels, sizes
+
+    def get_dataframe(self):
+        """Return a pandas dataframe of the events."""
+        return pd.DataFrame(self.events, columns=self.COLUMNS)
+
+    def get_sweep(self):
+        """Return the ThresholdSweep of the edges, which is built when
+        first requested and kept with the edges.
+        """
+        if self.sweep is None:
+            self.sweep = ThresholdSweep(self.get_edges())
+        return self.sweep
+
+    def get_memory_usage(self):
+        """Return the number of bytes held by this object in memory."""
+        usage = self.events.nbytes + self.parents.nbytes + \
+            self.distances.nbytes
+        if self.sweep is not None:
+            usage += self.sweep.get_memory_usage()
+        return usage
+
+
+class ThresholdSweep:
+    """Clusters of the nearest-neighbour clustering graph at any
+    threshold.
+
+    The graph has a node for each event ID with an edge. An edge is weak at
+    threshold T if 1 / (distance + 1e-10) >= T, so raising the threshold
+    only adds edges to the graph. The edges are sorted once by this key,
+    and the clusters at one or many thresholds are found by replaying the
+    edges that are not weak into a union-find structure.
+    """
+
+    def __init__(self, edges):
+        """Sort the edges of the graph by the threshold above which they
+        are kept.
+
+        Keyword arguments:
+        edges -- numpy array with a row for each edge, holding the event
+            IDs of its nodes and the distance, see NeighbourEdges.get_edges
+        """
+        edges = edges[edges[:, 0] != edges[:, 1]]
+        # The nodes are numbered by event ID and ranked by their first
+        # appearance in the edges
+        self.ids, self.ranks = np.unique(
+            edges[:, :2].ravel(), return_index=True
+        )
+        # An edge repeated with another distance keeps the last distance
+        _, last = np.unique(edges[::-1, :2], axis=0, return_index=True)
+        edges = edges[np.sort(len(edges) - 1 - last)]
+
+        nodes = np.searchsorted(self.ids, edges[:, :2])
+        with np.errstate(divide='ignore'):
+            keys = 1.0 / (edges[:, 2] + DISTANCE_OFFSET)
+        # Edges with a NaN distance are never weak
+        keys[np.isnan(keys)] = -np.inf
+
+        order = np.argsort(keys, kind='mergesort')
+        self.keys = keys[order]
+        self.sources = np.ascontiguousarray(nodes[order, 0])
+        self.targets = np.ascontiguousarray(nodes[order, 1])
+
+    def get_clusters(self, threshold):
+        """Return the cluster of each node at the given threshold and the
+        number of nodes in each cluster. The clusters are numbered from the
+        largest, and clusters of the same size in the order of the first
+        appearance of their nodes in the edges. The event ID of each node
+        is in the ids attribute.
+
+        Keyword arguments:
+        threshold -- Threshold for computing the weak edges
+        """
+        roots, _, _ = replay_edges(
+            self.sources, self.targets, len(self.ids),
+            np.array([self.get_edge_count(threshold)])
+        )
+        _, labels, sizes = np.unique(
+            get_labels(roots), return_inverse=True, return_counts=True
+        )
+        first_ranks = np.full(len(sizes), np.iinfo(np.int64).max)
+        np.minimum.at(first_ranks, labels, self.ranks)
+
+        order = np.lexsort((first_ranks, -sizes))
+        numbers = np.empty(len(order), np.int64)
+        numbers[order] = np.arange(len(order))
+        return numbers[labels], sizes[order]
+
+    def get_kept_edges(self, threshold):
+        """Return the nodes of the two ends of each edge that is not weak
+        at the given threshold.
+
+        Keyword arguments:
+        threshold -- Threshold for computing the weak edges
+        """
+        count = self.get_edge_count(threshold)
+        return self.sources[:count], self.targets[:count]
+
+    def get_sweep(self, thresholds):
+        """Return the number of clusters and the size of the largest
+        cluster at each of the given thresholds.
+
+        Keyword arguments:
+        thresholds -- numpy array of thresholds
+        """
+        thresholds = np.asarray(thresholds, dtype=float)
+        order = np.argsort(thresholds, kind='mergesort')
+        _, counts, largest = replay_edges(
+            self.sources, self.targets, len(self.ids),
+            self.get_edge_count(thresholds[order])
+        )
+        sweep_counts = np.empty_like(counts)
+        sweep_largest = np.empty_like(largest)
+        sweep_counts[order] = counts
+        sweep_largest[order] = largest
+        return sweep_counts, sweep_largest
+
+    def get_thresholds(self, steps):
+        """Return the given number of thresholds evenly spaced on a log
+        scale, from the threshold keeping the first edge of the graph to
+        the threshold keeping all of its edges.
+
+        Keyword arguments:
+        steps -- Number of thresholds
+        """
+        keys = self.keys[np.isfinite(self.keys) & (self.keys > 0)]
+        if len(keys) == 0:
+            return np.array([])
+
+        thresholds = np.logspace(
+            np.log10(keys[0]), np.log10(np.nextafter(keys[-1], np.inf)),
+            steps
+        )
+        # The logarithms can round the last threshold down to the key of
+        # the last edge, which would then be weak
+        thresholds[-1] = np.nextafter(keys[-1], np.inf)
+        return thresholds
+
+    def get_edge_count(self, threshold):
+        """Return the number of edges that are not weak at the given
+        threshold, or at each of the given sorted thresholds.
+
+        Keyword arguments:
+        threshold -- Threshold or numpy array of sorted thresholds
+        """
+        return np.searchsorted(self.keys, threshold, side='left')
+
+    def get_memory_usage(self):
+        """Return the number of bytes held by this object in memory."""
+        return self.ids.nbytes + self.ranks.nbytes + self.keys.nbytes + \
+            self.sources.nbytes + self.targets.nbytes
+
+
+def get_neighbours(data, threads=1):
+    """Return the NeighbourEdges of the given events.
+
+    The nearest neighbour of an event is the earlier event minimizing
+    time_diff * dist**1.6 * 10**(-magnitude), where the magnitude is the
+    magnitude of the later event. Ties go to the event that comes first in
+    the data, and a NaN distance wins over any other distance, as in an
+    exhaustive search with np.argmin. Instead of comparing every pair of
+    events, the earlier events are looked up in a spatial index whose
+    nodes are skipped when they cannot contain a closer neighbour.
+
+    Keyword arguments:
+    data -- numpy array with a row for each event and columns for the time,
+        event ID, magnitude, latitude and longitude
+    threads -- Number of threads looking up the events
+    """
+    data = np.asarray(data, dtype=np.float64)
+    parents = np.full(len(data), -1, get_row_dtype(data))
+    distances = np.zeros(len(data))
+    rows, chunk_parents, chunk_distances = get_neighbours_chunk(
+        data, 0, 1, threads
+    )
+    parents[rows] = chunk_parents
+    distances[rows] = chunk_distances
+    return NeighbourEdges(data, parents, distances)
+
+
+def get_neighbours_chunked(data, workers, threads=1):
+    """Return the NeighbourEdges of the given events, see get_neighbours.
+    The events are split in time order into one chunk per worker process,
+    and each process builds its own spatial index.
+
+    Keyword arguments:
+    data -- numpy array with a row for each event and columns for the time,
+        event ID, magnitude, latitude and longitude
+    workers -- Number of worker processes
+    threads -- Number of threads looking up the events in each process
+    """
+    data = np.asarray(data, dtype=np.float64)
+    parents = np.full(len(data), -1, get_row_dtype(data))
+    distances = np.zeros(len(data))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for rows, chunk_parents, chunk_distances in executor.map(
+                get_neighbours_chunk,
+                [data] * workers,
+                range(workers),
+                [workers] * workers,
+                [threads] * workers):
+            parents[rows] = chunk_parents
+            distances[rows] = chunk_distances
+
+    return NeighbourEdges(data, parents, distances)
+
+
+def get_neighbours_chunk(data, chunk, chunks, threads=1):
+    """Return the rows of the given chunk of the events, the row of the
+    nearest neighbour of each of these events, or -1 if there are no
+    earlier events, and their nearest-neighbour distances. The events are
+    split into chunks in time order.
+
+    Keyword arguments:
+    data -- numpy array with a row for each event and columns for the time,
+        event ID, magnitude, latitude and longitude
+    chunk -- Number of the chunk, from 0 to chunks - 1
+    chunks -- Number of chunks
+    threads -- Number of threads looking up the events
+    """
+    times = data[:, 0]
+    events = np.flatnonzero(~np.isnan(times))
+    events = events[np.argsort(times[events], kind='mergesort')]
+    start = len(events) * chunk // chunks
+    end = len(events) * (chunk + 1) // chunks
+    if start == end:
+        return events[:0], events[:0], np.zeros(0)
+
+    times = np.ascontiguousarray(times[events])
+    magnitudes = np.ascontiguousarray(data[events, 2])
+    latitudes = np.ascontiguousarray(data[events, 3])
+    longitudes = np.ascontiguousarray(data[events, 4])
+    located = np.isfinite(times) & np.isfinite(latitudes) & \
+        np.isfinite(longitudes)
+    # The distance to an event without a latitude or longitude is NaN
+    missing = np.isnan(latitudes) | np.isnan(longitudes)
+
+    index = build_index(
+        latitudes, longitudes, events,
+        np.flatnonzero(located).astype(get_row_dtype(events)), LEAF_SIZE
+    )
+    unlocated = np.flatnonzero(~located & ~missing)
+    earliest = (
+        get_earliest(events, np.ones(len(events), dtype=bool)),
+        get_earliest(events, missing)
+    )
+
+    def find_task_parents(task_start):
+        return find_parents(
+            times, magnitudes, latitudes, longitudes, events, unlocated,
+            earliest, index, task_start, min(task_start + TASK_EVENTS, end)
+        )
+
+    # The lookups release the GIL, so the tasks run in parallel threads
+    task_starts = range(start, end, TASK_EVENTS)
+    if threads > 1 and len(task_starts) > 1:
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            results = list(executor.map(find_task_parents, task_starts))
+    else:
+        results = [find_task_parents(task_start)
+                   for task_start in task_starts]
+
+    parents = np.concatenate([result[0] for result in results])
+    distances = np.concatenate([result[1] for result in results])
+    parents[parents >= 0] = events[parents[parents >= 0]]
+    return events[start:end], parents, distances
+
+
+@njit(nogil=True, cache=True)
+def replay_edges(sources, targets, node_count, stops):
+    """Unite the nodes of the given edges in order, and return the roots
+    of the nodes after the last stop, and the number of clusters and the
+    size of the largest cluster at each stop.
+
+    Keyword arguments:
+    sources -- Node of one end of each edge
+    targets -- Node of the other end of each edge
+    node_count -- Number of nodes
+    stops -- Sorted numbers of edges after which the clusters are counted
+    """
+    roots = np.arange(node_count)
+    sizes = np.ones(node_count, np.int64)
+    clusters = node_count
+    largest = min(node_count, 1)
+    counts = np.zeros(len(stops), np.int64)
+    largests = np.zeros(len(stops), np.int64)
+
+    edge = 0
+    for stop in range(len(stops)):
+        while edge < stops[stop]:
+            source = find_root(roots, sources[edge])
+            target = find_root(roots, targets[edge])
+            edge += 1
+            if source == target:
+                continue
+
+            # The smaller cluster is attached to the larger one
+            if sizes[source] < sizes[target]:
+                source, target = target, source
+            roots[target] = source
+            sizes[source] += sizes[target]
+            clusters -= 1
+            largest = max(largest, sizes[source])
+
+        counts[stop] = clusters
+        largests[stop] = largest
+
+    return roots, counts, largests
+
+
+@njit(nogil=True, cache=True)
+def find_root(roots, node):
+    """Return the root of the cluster of the given node, halving the path
+    to the root on the way.
+
+    Keyword arguments:
+    roots -- Parent of each node in the union-find structure
+    node -- Node to look up
+    """
+    while roots[node] != node:
+        roots[node] = roots[roots[node]]
+        node = roots[node]
+    return node
+
+
+@njit(nogil=True, cache=True)
+def get_labels(roots):
+    """Return the cluster of each node of a union-find structure, as the
+    smallest node number of the cluster.
+
+    Keyword arguments:
+    roots -- Parent of each node in the union-find structure
+    """
+    labels = np.empty(len(roots), np.int64)
+    first_nodes = np.full(len(roots), -1, np.int64)
+    for node in range(len(roots)):
+        root = find_root(roots, node)
+        if first_nodes[root] < 0:
+            first_nodes[root] = node
+        labels[node] = first_nodes[root]
+    return labels
+
+
+def get_earliest(order, selected):
+    """Return the position of the selected event with the smallest order
+    up to each position, or -1 if no event up to the position is selected.
+
+    Keyword arguments:
+    order -- Position of each event in the original data
+    selected -- Boolean array indicating the selected events
+    """
+    orders = np.where(selected, order, LAST_ORDER)
+    first = selected & (orders == np.minimum.accumulate(orders))
+    return np.maximum.accumulate(
+        np.where(first, np.arange(len(order)), -1)
+    )
+
+
+def get_row_dtype(data):
+    """Return the smallest of int32 and int64 that holds the row positions
+    of the given array.
+
+    Keyword arguments:
+    data -- numpy array
+    """
+    if len(data) < np.iinfo(np.int32).max:
+        return np.int32
+    return np.int64
+
+
+@njit(nogil=True, cache=True)
+def build_index(latitudes, longitudes, order, points, leaf_size):
+    """Return a balanced k-d tree of the given events as a tuple of arrays.
+
+    The nodes are numbered as in a binary heap, and the events of a node
+    are a contiguous range of each level of the tree. The ranges are sorted
+    by position, which is also time order, so the earlier events of a node
+    are a prefix of its range. For each node the tree holds its bounding
+    box and the smallest order of its events.
+
+    Keyword arguments:
+    latitudes -- Latitudes of the events, in time order
+    longitudes -- Longitudes of the events, in time order
+    order -- Position of each event in the original data
+    points -- Positions of the events with a location and time, in the
+        integer type of the rows of the tree
+    leaf_size -- Maximum number of events in a leaf
+    """
+    count = len(points)
+    depth = 0
+    while (count + (1 << depth) - 1) >> depth > leaf_size:
+        depth += 1
+
+    node_count = (1 << (depth + 1)) - 1
+    starts = np.zeros(node_count, np.int64)
+    ends = np.zeros(node_count, np.int64)
+    levels = np.zeros(node_count, np.int64)
+    ends[0] = count
+    for node in range((1 << depth) - 1):
+        middle = starts[node] + (ends[node] - starts[node]) // 2
+        starts[2 * node + 1] = starts[node]
+        ends[2 * node + 1] = middle
+        starts[2 * node + 2] = middle
+        ends[2 * node + 2] = ends[node]
+        levels[2 * node + 1] = levels[node] + 1
+        levels[2 * node + 2] = levels[node] + 1
+
+    # The positions are kept once on each level, so they are stored in the
+    # smallest integer type holding them
+    rows = np.zeros((depth + 1, count), points.dtype)
+    boxes = np.zeros((node_count, 4))
+    first_orders = np.zeros(node_count, np.int64)
+    permutation = points.copy()
+    for node in range(node_count):
+        segment = permutation[starts[node]:ends[node]]
+        rows[levels[node], starts[node]:ends[node]] = np.sort(segment)
+        if len(segment) == 0:
+            first_orders[node] = LAST_ORDER
+            continue
+
+        boxes[node, 0] = latitudes[segment].min()
+        boxes[node, 1] = latitudes[segment].max()
+        boxes[node, 2] = longitudes[segment].min()
+        boxes[node, 3] = longitudes[segment].max()
+        first_orders[node] = order[segment].min()
+        if levels[node] < depth:
+            if boxes[node, 1] - boxes[node, 0] >= \
+                    boxes[node, 3] - boxes[node, 2]:
+                split = np.argsort(latitudes[segment])
+            else:
+                split = np.argsort(longitudes[segment])
+            permutation[starts[node]:ends[node]] = segment[split]
+
+    # Smallest order of the events up to each event of a leaf
+    prefix_orders = np.zeros(count, np.int64)
+    for node in range((1 << depth) - 1, node_count):
+        first_order = LAST_ORDER
+        for idx in range(starts[node], ends[node]):
+            first_order = min(first_order, order[rows[depth, idx]])
+            prefix_orders[idx] = first_order
+
+    return starts, ends, levels, rows, boxes, first_orders, prefix_orders
+
+
+@njit(nogil=True, cache=True)
+def get_distance(time, latitude, longitude, factor, other_time,
+                 other_latitude, other_longitude):
+    """Return the nearest-neighbour distance between two events. The
+    operations are always done in the same order, so the index and the
+    exhaustive search compute bitwise identical distances.
+
+    Keyword arguments:
+    time -- Time of the later event
+    latitude -- Latitude of the later event
+    longitude -- Longitude of the later event
+    factor -- 10 to the power of the negative magnitude of the later event
+    other_time -- Time of the earlier event
+    other_latitude -- Latitude of the earlier event
+    other_longitude -- Longitude of the earlier event
+    """
+    dist = (latitude - other_latitude)**2 + (longitude - other_longitude)**2
+    return (time - other_time)*np.sqrt(dist)**(1.6)*factor
+
+
+@njit(nogil=True, cache=True)
+def get_box_distance(latitude, longitude, box):
+    """Return the smallest euclidean distance between the given location
+    and a bounding box.
+
+    Keyword arguments:
+    latitude -- Latitude of the location
+    longitude -- Longitude of the location
+    box -- Array of the minimum and maximum latitude and the minimum and
+        maximum longitude of the box
+    """
+    lat_diff = max(box[0] - latitude, 0.0, latitude - box[1])
+    lon_diff = max(box[2] - longitude, 0.0, longitude - box[3])
+    return np.sqrt(lat_diff**2 + lon_diff**2)
+
+
+@njit(nogil=True, cache=True)
+def find_parents(times, magnitudes, latitudes, longitudes, order,
+                 unlocated, earliest, index, start, end):
+    """Return the position of the nearest neighbour of each of the given
+    events, or -1 if there are no earlier events, and the nearest-neighbour
+    distances.
+
+    Keyword arguments:
+    times -- Sorted times of the events
+    magnitudes -- Magnitudes of the events, in time order
+    latitudes -- Latitudes of the events, in time order
+    longitudes -- Longitudes of the events, in time order
+    order -- Position of each event in the original data
+    unlocated -- Positions of the events with an infinite location or time
+    earliest -- Tuple of the positions of the event and of the event
+        without a location with the smallest order up to each position,
+        see get_earliest
+    index -- Spatial index returned by build_index
+    start -- Position of the first event to look up
+    end -- Position after the last event to look up
+    """
+    parents = np.full(end - start, -1, np.int64)
+    distances = np.zeros(end - start)
+    for position in range(start, end):
+        parents[position - start], distances[position - start] = \
+            find_parent(
+                position, times, magnitudes, latitudes, longitudes, order,
+                unlocated, earliest, index
+            )
+
+    return parents, distances
+
+
+@njit(nogil=True, cache=True)
+def find_parent(position, times, magnitudes, latitudes, longitudes, order,
+                unlocated, earliest, index):
+    """Return the position of the nearest neighbour of the given event, or
+    -1 if there are no earlier events, and the nearest-neighbour distance.
+
+    A NaN distance is chosen over every other distance, as by np.argmin.
+    If the event has no magnitude or location, all of its distances are
+    NaN, and if an earlier event has no location, the distance to it is
+    NaN. In both cases the earliest such event in the data is returned
+    without a search.
+
+    Keyword arguments:
+    position -- Position of the event
+    times -- Sorted times of the events
+    magnitudes -- Magnitudes of the events, in time order
+    latitudes -- Latitudes of the events, in time order
+    longitudes -- Longitudes of the events, in time order
+    order -- Position of each event in the original data
+    unlocated -- Positions of the events with an infinite location or time
+    earliest -- Positions of the earliest events, see find_parents
+    index -- Spatial index returned by build_index
+    """
+    time = times[position]
+    latitude = latitudes[position]
+    longitude = longitudes[position]
+    factor = 10**(-magnitudes[position])
+    earlier = np.searchsorted(times, time)
+    if earlier == 0:
+        return -1, 0.0
+
+    if np.isnan(factor) or np.isnan(latitude) or np.isnan(longitude):
+        return earliest[0][earlier - 1], np.nan
+
+    if not (np.isfinite(time) and np.isfinite(latitude) and
+            np.isfinite(longitude) and np.isfinite(factor) and factor > 0):
+        return find_parent_exhaustive(
+            position, times, latitudes, longitudes, factor, order, earlier
+        )
+
+    # Events with an infinite location or time can not be indexed, and the
+    # distance to them can still be NaN
+    nan_parent = earliest[1][earlier - 1]
+    nan_order = LAST_ORDER if nan_parent < 0 else order[nan_parent]
+    best = np.inf
+    best_order = LAST_ORDER
+    parent = -1
+    for other in unlocated[:np.searchsorted(unlocated, earlier)]:
+        distance = get_distance(
+            time, latitude, longitude, factor, times[other],
+            latitudes[other], longitudes[other]
+        )
+        if np.isnan(distance):
+            if order[other] < nan_order:
+                nan_order = order[other]
+                nan_parent = other
+        elif distance < best or \
+                distance == best and order[other] < best_order:
+            best = distance
+            best_order = order[other]
+            parent = other
+
+    if nan_parent >= 0:
+        return nan_parent, np.nan
+
+    starts, ends, levels, rows, boxes, first_orders, prefix_orders = index
+    depth = rows.shape[0] - 1
+
+    stack = np.zeros(2 * depth + 2, np.int64)
+    size = 1
+    while size > 0:
+        size -= 1
+        node = stack[size]
+        level = levels[node]
+        start = starts[node]
+        count = np.searchsorted(rows[level, start:ends[node]], earlier)
+        if count == 0:
+            continue
+
+        power = get_box_distance(latitude, longitude, boxes[node])**(1.6)
+        latest = rows[level, start + count - 1]
+        bound = (time - times[latest])*power*factor*BOUND_MARGIN
+        if bound > best or bound >= best and first_orders[node] > best_order:
+            continue
+
+        if level < depth:
+            left = 2 * node + 1
+            right = 2 * node + 2
+            left_distance = get_box_distance(latitude, longitude, boxes[left])
+            right_distance = get_box_distance(
+                latitude, longitude, boxes[right]
+            )
+            # The nearer child is visited first
+            if left_distance < right_distance or \
+                    left_distance == right_distance and \
+                    first_orders[left] <= first_orders[right]:
+                stack[size] = right
+                stack[size + 1] = left
+            else:
+                stack[size] = left
+                stack[size + 1] = right
+            size += 2
+            continue
+
+        # The events of a leaf are visited from the latest, and the bound
+        # grows with the time difference
+        for idx in range(start + count - 1, start - 1, -1):
+            other = rows[depth, idx]
+            bound = (time - times[other])*power*factor*BOUND_MARGIN
+            if bound > best or \
+                    bound >= best and prefix_orders[idx] > best_order:
+                break
+
+            distance = get_distance(
+                time, latitude, longitude, factor, times[other],
+                latitudes[other], longitudes[other]
+            )
+            if distance < best or \
+                    distance == best and order[other] < best_order:
+                best = distance
+                best_order = order[other]
+                parent = other
+
+    return parent, best
+
+
+@njit(nogil=True, cache=True)
+def find_parent_exhaustive(position, times, latitudes, longitudes, factor,
+                           order, earlier):
+    """Return the position of the nearest neighbour of the given event and
+    the nearest-neighbour distance by comparing every earlier event. Used
+    for the events with an infinite time, location or magnitude, whose
+    distances can be NaN or infinite.
+
+    Keyword arguments:
+    position -- Position of the event
+    times -- Sorted times of the events
+    latitudes -- Latitudes of the events, in time order
+    longitudes -- Longitudes of the events, in time order
+    factor -- 10 to the power of the negative magnitude of the event
+    order -- Position of each event in the original data
+    earlier -- Number of events earlier than the event
+    """
+    best = np.inf
+    best_order = LAST_ORDER
+    parent = -1
+    nan_order = LAST_ORDER
+    nan_parent = -1
+    for other in range(earlier):
+        distance = get_distance(
+            times[position], latitudes[position], longitudes[position],
+            factor, times[other], latitudes[other], longitudes[other]
+        )
+        if np.isnan(distance):
+            if order[other] < nan_order:
+                nan_order = order[other]
+                nan_parent = other
+        elif distance < best or \
+                distance == best and order[other] < best_order:
+            best = distance
+            best_order = order[other]
+            parent = other
+
+    if nan_parent >= 0:
+        return nan_parent, np.nan
+    return parent, best
@@ -0,0 +1,276 @@
+import threading
+
+import numpy as np
+
+# Quantiles computed for each numeric column
+QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+
+class ColumnStats:
+    """Statistics of the numeric columns of a catalog.
+
+    The statistics of a column are computed from all of its values the
+    first time any of them is requested, and kept for the lifetime of the
+    object. Filtered views of a catalog share the object of the whole
+    catalog, so each column is only summarized once per catalog. The same
+    holds for the group indexes of the columns, see GroupIndex.
+    """
+
+    def __init__(self, get_values, names, params=None):
+        """Create an object with no statistics computed yet.
+
+        Keyword arguments:
+        get_values -- Function returning a numpy array with all values of
+            the column of the given name
+        names -- Names of the numeric columns
+        params -- Dictionary of minimum and maximum values already known
+            for some of the columns, for example those saved in the
+            catalog store
+        """
+        self.get_values = get_values
+        self.names = list(names)
+        self.params = dict(params or {})
+        self.stats = {}
+        self.indexes = {}
+        self.lock = threading.Lock()
+
+    def get_params(self, name):
+        """Return the minimum and maximum of the given column as a tuple,
+        or None if the column is not a numeric column.
+
+        Keyword arguments:
+        name -- Name of the column
+        """
+        if name not in self.names:
+            return None
+
+        params = self.params.get(name)
+        if params is None:
+            stats = self.get_stats(name)
+            params = self.params[name] = (stats['min'], stats['max'])
+
+        return params
+
+    def get_all_params(self):
+        """Return a dictionary of the minimum and maximum of each numeric
+        column.
+        """
+        return {name: self.get_params(name) for name in self.names}
+
+    def get_stats(self, name):
+        """Return a dictionary with the minimum, maximum, quantiles, number
+        of missing values and number of distinct values of the given
+        column, or None if the column is not a numeric column.
+
+        Keyword arguments:
+        name -- Name of the column
+        """
+        if name not in self.names:
+            return None
+
+        with self.lock:
+            stats = self.stats.get(name)
+            if stats is None:
+                stats = self.stats[name] = get_stats(self.get_values(name))
+
+        return stats
+
+    def get_index(self, name):
+        """Return a GroupIndex of the given column, or None if the column
+        is not a numeric column.
+
+        Keyword arguments:
+        name -- Name of the column
+        """
+        if name not in self.names:
+            return None
+
+        with self.lock:
+            index = self.indexes.get(name)
+            if index is None:
+                index = self.indexes[name] = GroupIndex(self.get_values(name))
+
+        return index
+
+    def get_memory_usage(self):
+        """Return the number of bytes held by the group indexes built so
+        far.
+        """
+        with self.lock:
+            indexes = list(self.indexes.values())
+
+        return sum(index.get_memory_usage() for index in indexes)
+
+
+class GroupIndex:
+    """Row positions of a column grouped by value.
+
+    The positions of each distinct value are kept sorted, so the rows of a
+    value that fall within a slice of the time sorted rows are found with
+    a binary search. The positions are saved as keys combining the group
+    and the position, which keeps all groups in one sorted array.
+    """
+
+    def __init__(self, values):
+        """Group the rows by their values. Missing values are left out.
+
+        Keyword arguments:
+        values -- Numpy array of the values of a column
+        """
+        positions = np.arange(len(values))
+        if values.dtype.kind == 'f':
+            positions = positions[~np.isnan(values)]
+        positions = positions[np.argsort(values[positions], kind='stable')]
+
+        sorted_values = values[positions]
+        starts = np.flatnonzero(np.r_[True, sorted_values[1:] !=
+                                      sorted_values[:-1]])
+        if len(positions) == 0:
+            starts = starts[:0]
+
+        self.values = sorted_values[starts]
+        self.row_count = len(values)
+        self.groups = np.full(len(values), -1, dtype=np.int32)
+        self.groups[positions] = np.repeat(
+            np.arange(len(starts), dtype=np.int32),
+            np.diff(np.r_[starts, len(positions)])
+        )
+        self.keys = self.groups[positions].astype(np.int64) \
+            * self.row_count + positions
+
+    def get_rows(self, value, rows=None):
+        """Return the sorted positions of the given rows that have the
+        given value.
+
+        Keyword arguments:
+        value -- Value to look up
+        rows -- A slice or a sorted array of row positions, or None for
+            all rows
+        """
+        group = np.searchsorted(self.values, value)
+        if group == len(self.values) or self.values[group] != value:
+            return np.array([], dtype=np.int64)
+
+        start, stop = 0, self.row_count
+        if isinstance(rows, slice):
+            start, stop = rows.start, rows.stop
+
+        base = group * self.row_count
+        positions = self.keys[
+            np.searchsorted(self.keys, base + start):
+            np.searchsorted(self.keys, base + stop)
+        ] - base
+
+        if rows is None or isinstance(rows, slice):
+            return positions
+        if len(rows) == 0:
+            return rows
+
+        idx = np.searchsorted(rows, positions).clip(max=len(rows) - 1)
+        return positions[rows[idx] == positions]
+
+    def get_values(self, rows=None):
+        """Return the sorted distinct values of the given rows, missing
+        values excluded.
+
+        Keyword arguments:
+        rows -- A slice or an array of row positions, or None for all rows
+        """
+        if rows is None:
+            return self.values
+
+        if isinstance(rows, slice):
+            bases = np.arange(len(self.values)) * self.row_count
+            return self.values[
+                np.searchsorted(self.keys, bases + rows.stop) >
+                np.searchsorted(self.keys, bases + rows.start)
+            ]
+
+        groups = self.groups[rows]
+        return self.values[np.unique(groups[groups >= 0])]
+
+    def get_memory_usage(self):
+        """Return the number of bytes held by the index."""
+        return self.values.nbytes + self.groups.nbytes + self.keys.nbytes
+
+
+def get_stats(values):
+    """Return the statistics of the given values, see
+    ColumnStats.get_stats. The values are sorted once and every statistic
+    is read from the sorted values. Missing values are ignored, and a
+    column with only missing values has NaN bounds and quantiles. The
+    bounds and quantiles of float32 columns are given by their shortest
+    decimal representation, see get_decimal_values.
+
+    Keyword arguments:
+    values -- Numpy array of the values of a column
+    """
+    nulls = len(values)
+    if values.dtype.kind == 'f':
+        values = values[~np.isnan(values)]
+    values = np.sort(values)
+    count = len(values)
+    nulls -= count
+    if count == 0:
+        return {
+            'min': np.nan,
+            'max': np.nan,
+            'quantiles': {q: np.nan for q in QUANTILES},
+            'nulls': nulls,
+            'distinct': 0
+        }
+
+    positions = np.array(QUANTILES) * (count - 1)
+    lower = np.floor(positions).astype(int)
+    upper = np.ceil(positions).astype(int)
+    fractions = positions - lower
+    quantiles = values[lower] + (values[upper] - values[lower]) * fractions
+
+    minimum, maximum = values[0], values[-1]
+    if values.dtype == np.float32:
+        minimum, maximum = get_decimal_values(values[[0, -1]])
+        quantiles = get_decimal_values(quantiles.astype(np.float32))
+
+    return {
+        'min': minimum,
+        'max': maximum,
+        'quantiles': dict(zip(QUANTILES, quantiles.tolist())),
+        'nulls': nulls,
+        'distinct': 1 + int(np.count_nonzero(values[1:] != values[:-1]))
+    }
+
+
+def get_decimal_values(values):
+    """Return float32 values as float64 values of their shortest decimal
+    representation, e.g. 0.04 instead of 0.03999999910593033, so that they
+    are shown as in the catalog file. The result equals converting each
+    value to a string and back, without formatting any strings.
+
+    The values are rounded to an increasing number of significant digits
+    until the rounded value converts back to the same float32 value.
+
+    Keyword arguments:
+    values -- Numpy array of float32 values
+    """
+    wide = values.astype(np.float64)
+    decimals = wide.copy()
+    pending = np.flatnonzero(np.isfinite(wide) & (wide != 0))
+    exponents = np.floor(np.log10(np.abs(wide[pending]))).astype(int)
+
+    # Nine significant digits are enough for any float32 value
+    for digits in range(1, 10):
+        if len(pending) == 0:
+            break
+
+        shifts = digits - 1 - exponents
+        scales = 10.0 ** np.abs(shifts)
+        rounded = np.where(
+            shifts >= 0,
+            np.round(wide[pending] * scales) / scales,
+            np.round(wide[pending] / scales) * scales
+        )
+        exact = rounded.astype(np.float32) == values[pending]
+        decimals[pending[exact]] = rounded[exact]
+        pending, exponents = pending[~exact], exponents[~exact]
+
+    return decimals
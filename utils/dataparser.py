@@ -1,11 +1,20 @@
-import base64
+import os
 import re
+import bz2
+import gzip
+import hashlib
+import tempfile
 
-from app import cache
-from utils import earthquake_data
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from app import catalog_cache, server
+from utils import earthquake_data, catalog_store
 from utils.parsers import (
     qtm_parse, fm_parse, basel_parse, otaniemi_parse, generic_parse,
-    fencat_parse
+    fencat_parse, parse_chunked
 )
 from utils.catalog_types import CatalogTypes
 
@@ -18,45 +27,199 @@ PARSERS = {
     CatalogTypes.CSV_EXT: generic_parse,
     CatalogTypes.FEN_EXT: fencat_parse
 }
+# Parsers of line based formats that can parse a file in chunks, with the
+# number of header lines parsed with every chunk
+CHUNKED_PARSERS = {
+    qtm_parse: 1,
+    fm_parse: 0,
+    generic_parse: 0
+}
+# Files larger than the chunk size are parsed in chunks of at most this
+# size by a pool of worker processes
+PARSE_CHUNK_BYTES = server.config.get('PARSE_CHUNK_BYTES', 64 * 1024 ** 2)
+PARSE_WORKERS = server.config.get('PARSE_WORKERS', os.cpu_count())
+# Suffixes of compressed catalog files, e.g. catalog.scedc.gz
+COMPRESSIONS = ['.gz', '.bz2', '.zst']
+EXTENSION_REGEX = re.compile(r'[.]\w+')
+# Content hashes of the catalog files bundled with the application
+BUNDLED_DIGESTS = {}
+# Uploads are read from the request in chunks of this many bytes.
+UPLOAD_CHUNK_SIZE = 1024 ** 2
 
 
-def parse_contents(contents, filename, session_id, use_sample_data):
-    """Parse the input into a dataframe using correct parser
+def parse_file(path, filename, session_id, digest):
+    """Parse the given file into a dataframe using correct parser
     depending on the file extension, saving the results.
 
+    Catalogs are saved to the shared catalog store under a hash of their
+    contents, and the session refers to the shared catalog. If a catalog
+    with the same contents has already been saved, e.g. the sample data
+    set or a repeated upload of the same file, parsing is skipped.
+
     Keyword arguments:
-    contents -- The contents of the uploaded file as a binary string
+    path -- Path of the catalog file on the server
     filename -- Name of the uploaded file
     session_id -- ID of the current session
-    use_sample_data -- Whether to use the sample data set
+    digest -- Content hash of the catalog file
+    """
+    file_extension = get_file_extension(filename)
+    parser = get_parser(file_extension)
+    compression = get_compression(filename)
+
+    if not catalog_store.catalog_exists(
+        earthquake_data.SHARED_CATALOG_DIR % digest
+    ):
+        eq_data = parse_path(path, parser, compression)
+
+        save_shared_data(digest, eq_data, file_extension)
+
+    link_shared_data(session_id, digest)
+
+
+def parse_path(path, parser, compression=None):
+    """Return a dataframe containing the catalog in the given file. Large
+    uncompressed files of line based formats are parsed in parallel
+    chunks, compressed files are decompressed while they are parsed.
+
+    Keyword arguments:
+    path -- Path of the catalog file on the server
+    parser -- Parser of the catalog format
+    compression -- Compression suffix of the file, or None
+    """
+    size = os.path.getsize(path)
+    if compression is None and parser in CHUNKED_PARSERS and \
+            PARSE_WORKERS > 1 and size > PARSE_CHUNK_BYTES:
+        return parse_chunked(
+            parser, path, CHUNKED_PARSERS[parser],
+            min(PARSE_CHUNK_BYTES, size // PARSE_WORKERS + 1), PARSE_WORKERS
+        )
+
+    with open_catalog(path, compression) as f:
+        return parser(f)
+
+
+def open_catalog(path, compression=None):
+    """Return a binary file object reading the given catalog file,
+    decompressing it incrementally if it is compressed.
+
+    Keyword arguments:
+    path -- Path of the catalog file on the server
+    compression -- Compression suffix of the file, or None
+    """
+    if compression == '.gz':
+        return gzip.open(path, 'rb')
+    if compression == '.bz2':
+        return bz2.open(path, 'rb')
+    if compression == '.zst':
+        return zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'))
+    return open(path, 'rb')
+
+
+def parse_sample_data(filename, session_id):
+    """Parse a catalog file bundled with the application and save the
+    results for the session.
+
+    Keyword arguments:
+    filename -- Name of the bundled file
+    session_id -- ID of the current session
     """
-    if use_sample_data:
-        with open(filename) as f:
-            contents = f.read()
+    digest = get_bundled_digest(filename, get_file_extension(filename))
+    parse_file(filename, filename, session_id, digest)
 
-    else:
-        content_type, content_string = contents.split(',')
 
-        contents = base64.b64decode(content_string).decode('utf-8')
+def parse_stream(stream, filename, session_id):
+    """Parse an uploaded catalog file streamed in the body of a request
+    and save the results for the session. Return the content hash that
+    identifies the saved catalog.
 
+    The file is written to disk in chunks while its hash is computed, so
+    the upload is never held in memory as a whole.
+
+    Keyword arguments:
+    stream -- Binary file object to read the uploaded file from
+    filename -- Name of the uploaded file
+    session_id -- ID of the current session
+    """
     file_extension = get_file_extension(filename)
-    parser = get_parser(file_extension)
+    get_parser(file_extension)
+    get_compression(filename)
+
+    os.makedirs(earthquake_data.UPLOAD_DIR, exist_ok=True)
+    fd, path = tempfile.mkstemp(dir=earthquake_data.UPLOAD_DIR)
+    try:
+        digest = hashlib.sha256(file_extension.encode('utf-8'))
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in iter(lambda: stream.read(UPLOAD_CHUNK_SIZE), b''):
+                digest.update(chunk)
+                f.write(chunk)
 
-    eq_data = parser(contents)
+        digest = digest.hexdigest()
+        parse_file(path, filename, session_id, digest)
 
-    save_uploaded_data(session_id, eq_data, file_extension)
-    return eq_data
+    finally:
+        os.remove(path)
+
+    return digest
+
+
+def is_session_catalog(session_id, digest):
+    """Return boolean indicating whether the session refers to the shared
+    catalog with the given content hash.
+
+    Keyword arguments:
+    session_id -- ID of the current session
+    digest -- Content hash of the shared catalog
+    """
+    if not digest:
+        return False
+
+    try:
+        return os.path.samefile(
+            earthquake_data.get_session_path(session_id),
+            earthquake_data.SHARED_CATALOG_DIR % digest
+        )
+    except FileNotFoundError:
+        return False
+
+
+def get_bundled_digest(filename, extension):
+    """Return the content hash of a catalog file bundled with the
+    application. The hash is computed only once per process.
+
+    Keyword arguments:
+    filename -- Name of the bundled file
+    extension -- File extension identifying the catalog type
+    """
+    if filename not in BUNDLED_DIGESTS:
+        with open(filename, 'rb') as f:
+            BUNDLED_DIGESTS[filename] = get_digest(f.read(), extension)
+
+    return BUNDLED_DIGESTS[filename]
+
+
+def get_digest(contents, extension):
+    """Return a hash identifying a catalog by its contents and type.
+
+    Keyword arguments:
+    contents -- The contents of the catalog file as bytes
+    extension -- File extension identifying the catalog type
+    """
+    digest = hashlib.sha256(extension.encode('utf-8'))
+    digest.update(contents)
+    return digest.hexdigest()
 
 
 def get_file_extension(filename):
     """Return file extension of the given file or raise an exception
-    if there is none.
+    if there is none. The suffix of a compressed file is skipped, e.g.
+    the extension of catalog.scedc.gz is .scedc.
 
     Keyword arguments:
     filename -- Name of the file
     """
-    extension_regex = re.compile(r'[.]\w+')
-    matches = extension_regex.findall(filename)
+    matches = EXTENSION_REGEX.findall(filename)
+    if get_compression(filename) is not None:
+        matches.pop()
 
     if len(matches) == 0:
         raise Exception('Not a recognised file type: {}'.format(filename))
@@ -64,6 +227,27 @@ def get_file_extension(filename):
     return matches[-1]
 
 
+def get_compression(filename):
+    """Return the compression suffix of the given file, or None if the
+    file is not compressed. Raise an exception if the compression is not
+    supported.
+
+    Keyword arguments:
+    filename -- Name of the file
+    """
+    matches = EXTENSION_REGEX.findall(filename)
+    if len(matches) < 2 or matches[-1].lower() not in COMPRESSIONS:
+        return None
+
+    compression = matches[-1].lower()
+    if compression == '.zst' and zstandard is None:
+        raise Exception('Could not parse file of type: {}'.format(
+            compression
+        ))
+
+    return compression
+
+
 def get_parser(extension):
     """Return parser based on given extension or raise exception if
     no such parser exists for the given extension.
@@ -79,19 +263,45 @@ def get_parser(extension):
     return parser
 
 
-def save_uploaded_data(session_id, data, extension):
-    """Empty cache for current session, save the new data and
-    file extension to file.
+def get_catalog(data, extension):
+    """Return the parsed data as an EarthquakeData object of the correct
+    catalog type.
 
     Keyword arguments:
-    session_id -- ID of the current session
+    data -- Pandas dataframe containing the parsed data
+    extension -- File extension identifying the catalog type
+    """
+    catalog_type = CatalogTypes(extension)
+    return earthquake_data.EXTENSIONS[catalog_type](data)
+
+
+def save_shared_data(digest, data, extension):
+    """Save the new data with its catalog type to the shared catalog store.
+
+    Keyword arguments:
+    digest -- Content hash of the uploaded file
     data -- Pandas dataframe containing the uploaded data
-    extesions -- File extension of the uploaded file
+    extension -- File extension of the uploaded file
     """
-    cache.delete_memoized(earthquake_data.get_earthquake_data, session_id)
-    cache.delete_memoized(earthquake_data.get_earthquake_data_by_dates)
+    catalog_store.save_catalog(
+        earthquake_data.SHARED_CATALOG_DIR % digest,
+        get_catalog(data, extension),
+        earthquake_data.STORE_DIR
+    )
+
 
-    data.to_json(earthquake_data.TEMP_FILE_DF % session_id)
+def link_shared_data(session_id, digest):
+    """Empty cache for current session and make the session refer to a
+    catalog in the shared catalog store.
+
+    Keyword arguments:
+    session_id -- ID of the current session
+    digest -- Content hash of the shared catalog
+    """
+    catalog_cache.delete_namespace(session_id)
 
-    with open(earthquake_data.TEMP_FILE_EXT % session_id, 'w') as file_out:
-        file_out.write(extension)
+    catalog_store.link_catalog(
+        earthquake_data.get_session_path(session_id),
+        earthquake_data.SHARED_CATALOG_DIR % digest,
+        earthquake_data.STORE_DIR
+    )
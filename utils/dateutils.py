@@ -1,6 +1,11 @@
 from math import modf
 from datetime import datetime, timedelta
 
+import numpy as np
+
+# Days between which all times can be represented as datetime64[ns]
+NS_DATE_RANGE = (np.datetime64('1677-09-21'), np.datetime64('2262-04-11'))
+
 
 def get_datetime(year, month, day, hour, minute, second_float):
     """Return datetime object with given arguments. If argument second
@@ -41,6 +46,62 @@ def get_datetime(year, month, day, hour, minute, second_float):
     )
 
 
+def get_datetimes(years, months, days, hours, minutes, seconds_float):
+    """Return a datetime64 array built from the given columns. This is
+    the columnar counterpart of get_datetime: seconds and minutes larger
+    than or equal to 60 are normalized in the same way. Rows with a
+    missing value in any of the columns, or a date outside the range of
+    datetime64[ns] (years 1678-2261), get NaT.
+
+    Keyword arguments:
+    years -- Array-like of years
+    months -- Array-like of months
+    days -- Array-like of days
+    hours -- Array-like of hours
+    minutes -- Array-like of minutes
+    seconds_float -- Array-like of seconds and microseconds as floats
+    """
+    columns = [
+        np.asarray(column, dtype=np.float64)
+        for column in (years, months, days, hours, minutes, seconds_float)
+    ]
+    missing = np.zeros(len(columns[0]), dtype=bool)
+    for column in columns:
+        missing |= np.isnan(column)
+
+    years, months, days, hours, minutes, seconds_float = [
+        np.where(missing, 1, column) for column in columns
+    ]
+
+    second_fractions, seconds = np.modf(seconds_float)
+    microseconds = (second_fractions * 1000000).astype(np.int64)
+    seconds = seconds.astype(np.int64)
+    minutes = minutes.astype(np.int64)
+
+    # A value of 60 or more is wrapped and carried over as one extra
+    # minute or hour, like in get_datetime.
+    seconds = np.where(seconds >= 60, seconds % 60 + 60, seconds)
+    minutes = np.where(minutes >= 60, minutes % 60 + 60, minutes)
+
+    dates = (
+        (years.astype(np.int64) - 1970).astype('datetime64[Y]')
+        .astype('datetime64[M]')
+        + (months.astype(np.int64) - 1).astype('timedelta64[M]')
+    ).astype('datetime64[D]') + (days.astype(np.int64) - 1)
+    missing |= (dates <= NS_DATE_RANGE[0]) | (dates >= NS_DATE_RANGE[1])
+
+    nanoseconds = (
+        dates.astype('datetime64[ns]').view(np.int64)
+        + ((hours.astype(np.int64) * 60 + minutes) * 60 + seconds)
+        * 1000000000
+        + microseconds * 1000
+    )
+
+    return np.where(
+        missing, np.datetime64('NaT'), nanoseconds.view('datetime64[ns]')
+    ).astype('datetime64[ns]')
+
+
 def get_datetime_from_str(date_str):
     """Parse the given date string to a datetime object.
 
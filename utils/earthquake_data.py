@@ -1,18 +1,25 @@
 import os
-import json
-from datetime import datetime, timedelta
+from datetime import timedelta
+from functools import lru_cache
 
 import pandas as pd
 import numpy as np
-from pyproj import Proj
-from pyproj import Geod
-from app import cache
+from pyproj import CRS, Geod, Transformer
+from app import catalog_cache, server
+from utils import catalog_store, session
 from utils.catalog_types import CatalogTypes
-from utils.dateutils import get_datetime
-
-TEMP_FILE_DF = './uploaded_df_%s.temp'
-TEMP_FILE_EXT = './uploaded_ext_%s.temp'
-PROJECTION = Proj(init='epsg:3879')
+from utils.column_stats import ColumnStats, get_decimal_values
+from utils.dateutils import get_datetimes
+
+STORE_DIR = server.config.get('CATALOG_STORE_DIR', './catalog-store')
+SESSION_CATALOG_DIR = os.path.join(STORE_DIR, 'sessions', '%s')
+SHARED_CATALOG_DIR = os.path.join(STORE_DIR, 'catalogs', '%s')
+UPLOAD_DIR = os.path.join(STORE_DIR, 'uploads')
+# Unused session catalogs are removed after 10 hours by default.
+SESSION_TTL = server.config.get('SESSION_TTL', 36000)
+SWEEP_INTERVAL = 600
+# Coordinate system of the eastings and northings of the Otaniemi catalog
+PROJECTION_EPSG = 3879
 LOCATION_UNCERTAINTY = {
     ' ': 0,
     'A': 0.2,
@@ -21,19 +28,198 @@ LOCATION_UNCERTAINTY = {
     '?': 0
 }
 DIRECTIONS = np.array([(0, 1), (0, -1), (1, 0), (-1, 0)])
+# Integer value of NaT in an int64 epoch-nanosecond array. It is the
+# smallest int64, so events without a time always sort first.
+NAT_NS = np.iinfo(np.int64).min
 
 
 class EarthquakeData:
     """Internal representation of uploaded catalog data."""
 
-    def __init__(self, catalog_type, data):
+    # Compact dtypes of the columns of the catalog type, see apply_schema.
+    # Coordinates are kept as float64.
+    SCHEMA = {}
+
+    def __init__(self, catalog_type, data, dates=None):
+        """Sort the rows chronologically and index them by an int64
+        epoch-nanosecond time column, so that date ranges can be answered
+        with a binary search.
+
+        Keyword arguments:
+        catalog_type -- Catalog type of the data
+        data -- Pandas dataframe containing the catalog
+        dates -- Pandas Series with the datetime of each row in data
+        """
+        if dates is None:
+            dates = pd.Series(index=data.index, dtype='datetime64[ns]')
+        data = apply_schema(data, self.SCHEMA)
+
+        times = dates.to_numpy(dtype='datetime64[ns]').view(np.int64)
+        if np.any(times[1:] < times[:-1]):
+            order = np.argsort(times, kind='mergesort')
+            data = data.iloc[order]
+            dates = dates.iloc[order]
+            times = times[order]
+
         self.catalog_type = catalog_type
+        self.table = None
+        self.rows = None
         self.data = data
-        self.dates = pd.Series(dtype='datetime64[ns]')
-        self.column_params = {
-            column: (data[column].min(), data[column].max())
-            for column in data.select_dtypes(np.number)
-        }
+        self.dates = dates
+        self.times = times
+        self.stats = ColumnStats(
+            lambda name: data[name].to_numpy(),
+            data.select_dtypes(np.number).columns
+        )
+
+    @classmethod
+    def from_columns(cls, catalog_type, data, dates, stats):
+        """Return an object of this class holding already parsed and
+        chronologically sorted data, without running the constructor.
+
+        Keyword arguments:
+        catalog_type -- Catalog type of the data
+        data -- Pandas dataframe containing the parsed catalog
+        dates -- Pandas Series with the datetime of each row in data
+        stats -- ColumnStats object of the whole catalog
+        """
+        catalog = cls.__new__(cls)
+        catalog.catalog_type = catalog_type
+        catalog.table = None
+        catalog.rows = None
+        catalog.data = data
+        catalog.dates = dates
+        catalog.times = dates.to_numpy(dtype='datetime64[ns]').view(np.int64)
+        catalog.stats = stats
+        return catalog
+
+    @classmethod
+    def from_table(cls, catalog_type, table, rows=None, stats=None):
+        """Return an object of this class backed by the memory mapped
+        columns of a catalog in the catalog store. The dataframe and the
+        dates are only built from the selected rows when first used.
+
+        Keyword arguments:
+        catalog_type -- Catalog type of the data
+        table -- StoredCatalog holding the columns
+        rows -- A slice or an array of row positions in the table, or None
+            for all rows
+        stats -- ColumnStats object of the whole catalog, by default a new
+            object seeded with the column parameters saved with the table
+        """
+        catalog = cls.__new__(cls)
+        catalog.catalog_type = catalog_type
+        catalog.table = table
+        catalog.rows = rows
+        catalog.data = None
+        catalog.dates = None
+        catalog.times = table.times if rows is None else table.times[rows]
+        catalog.stats = stats
+        if stats is None:
+            catalog.stats = ColumnStats(
+                table.get_column, table.column_params, table.column_params
+            )
+        return catalog
+
+    @property
+    def column_params(self):
+        """Minimum and maximum values of each numeric column."""
+        return self.stats.get_all_params()
+
+    @property
+    def data(self):
+        """Pandas dataframe containing the catalog."""
+        if self._data is None:
+            self._data = self.table.get_frame(self.rows)
+        return self._data
+
+    @data.setter
+    def data(self, data):
+        self._data = data
+
+    @property
+    def dates(self):
+        """Pandas Series with the datetime of each row in the data."""
+        if self._dates is None:
+            self._dates = pd.Series(
+                self.times.view('datetime64[ns]'),
+                name=self.table.dates_name
+            )
+        return self._dates
+
+    @dates.setter
+    def dates(self, dates):
+        self._dates = dates
+
+    def get_column(self, column_name):
+        """Return a pandas Series with the values of the given column,
+        without building the whole dataframe if it has not been built yet.
+
+        Keyword arguments:
+        column_name -- Name of the column
+        """
+        if self._data is None:
+            return pd.Series(
+                self.table.get_column(column_name, self.rows),
+                name=column_name
+            )
+        return self.data[column_name]
+
+    def get_column_chunks(self, column_names):
+        """Return a generator of tuples of numpy arrays, holding the values
+        of the given columns for consecutive chunks of the rows. For a
+        catalog in the catalog store a chunk is a row group, see
+        StoredCatalog.get_row_groups, so the columns are never read whole.
+
+        Keyword arguments:
+        column_names -- List of column names
+        """
+        if self.table is None:
+            yield tuple(
+                self.get_column(name).to_numpy() for name in column_names
+            )
+            return
+
+        for rows in self.table.get_row_groups(self.rows):
+            yield tuple(
+                self.table.get_column(name, rows) for name in column_names
+            )
+
+    def get_columns(self, include=None):
+        """Return the names of the columns in the data.
+
+        Keyword arguments:
+        include -- Dtypes of the columns to include, as accepted by
+            DataFrame.select_dtypes, or None for all columns
+        """
+        data = self._data
+        if data is None:
+            data = self.table.get_frame(slice(0, 0))
+
+        if include is None:
+            return data.columns
+        return data.select_dtypes(include=include).columns
+
+    def get_memory_usage(self):
+        """Return the number of bytes held by this object in memory.
+        Columns that are only memory mapped from the catalog store are not
+        included. The column statistics and group indexes shared by the
+        views of a stored catalog are counted by the whole catalog only.
+        """
+        usage = 0
+        if self.table is not None and self.rows is None:
+            usage += self.stats.get_memory_usage()
+        if self._data is not None:
+            usage += self._data.memory_usage().sum()
+        if self._dates is not None:
+            usage += self._dates.memory_usage()
+        if not isinstance(self.times, np.memmap):
+            usage += self.times.nbytes
+        return usage
+
+    def get_row_count(self):
+        """Return the number of earthquakes in the data."""
+        return len(self.times)
 
     def get_datetimes(self):
         """Return a pandas Series with the datetimes for each of the
@@ -45,41 +231,76 @@ class EarthquakeData:
         """Returns a pandas Series with the latitude for each of the
         earthquakes in the uploaded data.
         """
-        return self.data['LATITUDE']
+        return self.get_column('LATITUDE')
 
     def get_longitudes(self):
         """Return a pandas Series with the longitude for each of the
         earthquakes in the uploaded data.
         """
-        return self.data['LONGITUDE']
+        return self.get_column('LONGITUDE')
 
     def get_depths(self):
         """Return a pandas Series with the depth for each of the
         earthquakes in the uploaded data. Unit is meters.
         """
-        return self.data['DEPTH'] * 1000
+        return self.get_column('DEPTH') * 1000
 
     def get_magnitudes(self):
         """Return a pandas Series with the local magnitude for each of
         the earthquakes in the uploaded data.
         """
-        return self.data['MAGNITUDE']
+        return self.get_column('MAGNITUDE')
 
     def get_eventids(self):
         """Return a pandas Series with the event IDs for each of
         the earthquakes in the uploaded data.
         """
-        return self.data['EVENTID']
+        return self.get_column('EVENTID')
 
     def get_templateids(self):
-        """Return a pandas Series with the template IDs for each of
-        the earthquakes in the uploaded data.
+        """Return an array with the distinct template IDs of the
+        earthquakes in the uploaded data.
         """
-        return self.data['TEMPLATEID'].unique()
+        return self.get_distinct_values('TEMPLATEID')
+
+    def get_distinct_values(self, column_name):
+        """Return an array with the distinct values of the given numeric
+        column, missing values excluded.
+
+        For a catalog in the catalog store, the values are read from the
+        group index of the column, which is built once for the catalog.
+
+        Keyword arguments:
+        column_name -- Name of the column
+        """
+        if self.table is None:
+            return self.get_column(column_name).dropna().unique()
+
+        return self.stats.get_index(column_name).get_values(self.rows)
 
     def get_daterange(self):
         """Return minimum and maximum dates in the data as timestamps."""
-        return self.dates.min(), self.dates.max()
+        first = np.searchsorted(self.times, NAT_NS, side='right')
+        if first == len(self.times):
+            return pd.NaT, pd.NaT
+
+        return pd.Timestamp(self.times[first]), pd.Timestamp(self.times[-1])
+
+    def get_date_slice(self, datemin, datemax):
+        """Return the slice of rows containing the events that happened
+        between given dates, inclusive.
+
+        Keyword arguments:
+        datemin -- Datetime object for the start of the date range
+        datemax -- Datetime object for the end of the date range
+        """
+        start = np.searchsorted(
+            self.times, pd.Timestamp(datemin).value, side='left'
+        )
+        end = np.searchsorted(
+            self.times, pd.Timestamp(datemax).value, side='right'
+        )
+        return slice(start, max(start, end))
 
     def get_data_by_daterange(self, datemin, datemax):
         """Return data filtered to contain only events that happened between
@@ -89,32 +310,130 @@ class EarthquakeData:
         datemin -- Datetime object for the start of the date range
         datemax -- Datetime object for the end of the date range
         """
-        return self.data[(self.dates <= datemax) & (self.dates >= datemin)]
+        return self.data.iloc[self.get_date_slice(datemin, datemax)]
+
+    def select_rows(self, rows):
+        """Return a view of this object containing only the given rows.
+
+        The view is an object of the same class that shares the already
+        parsed columns, dates and column statistics of this object, so
+        nothing is parsed or computed again.
+
+        Keyword arguments:
+        rows -- A slice or a sorted array of row positions
+        """
+        if self.table is not None:
+            return self.from_table(
+                self.catalog_type,
+                self.table,
+                combine_rows(self.rows, rows),
+                self.stats
+            )
+
+        return self.from_columns(
+            self.catalog_type,
+            self.data.iloc[rows],
+            self.dates.iloc[rows],
+            self.stats
+        )
 
     def filter_by_dates(self, datemin, datemax):
-        """Return a new EarthquakeData object filtered to contain only events
+        """Return a view of this object filtered to contain only events
         that happened between given dates, inclusive.
 
         Keyword arguments:
         datemin -- Datetime object for the start of the date range
         datemax -- Datetime object for the end of the date range
         """
-        return EarthquakeData(
+        return self.select_rows(self.get_date_slice(datemin, datemax))
+
+    def filter_by_range(self, column_name, low, high):
+        """Return a view of this object filtered to contain only events
+        whose value in the given numeric column is between the given
+        bounds, inclusive.
+
+        Keyword arguments:
+        column_name -- Name of the column
+        low -- Lower bound of the range
+        high -- Upper bound of the range
+        """
+        return self.filter_by_ranges({column_name: (low, high)})
+
+    def filter_by_bounds(self, latmin, latmax, lonmin, lonmax):
+        """Return a view of this object filtered to contain only events
+        located within the given bounding box, inclusive.
+
+        Keyword arguments:
+        latmin -- Minimum latitude
+        latmax -- Maximum latitude
+        lonmin -- Minimum longitude
+        lonmax -- Maximum longitude
+        """
+        return self.filter_by_ranges({
+            'LATITUDE': (latmin, latmax),
+            'LONGITUDE': (lonmin, lonmax)
+        })
+
+    def filter_by_ranges(self, ranges):
+        """Return a view of this object filtered to contain only events
+        whose values in the given numeric columns are between the given
+        bounds, inclusive.
+
+        For a catalog in the catalog store, only the row groups whose zone
+        maps overlap all of the ranges are read from the columns, and each
+        column only for the rows left by the columns before it.
+
+        Keyword arguments:
+        ranges -- Dictionary of column names and (low, high) tuples
+        """
+        if self.table is None:
+            selected = np.ones(self.get_row_count(), dtype=bool)
+            for name, (low, high) in ranges.items():
+                values = self.get_column(name).to_numpy()
+                selected &= (values >= low) & (values <= high)
+            return self.select_rows(np.flatnonzero(selected))
+
+        rows = self.table.get_candidate_rows(ranges, self.rows)
+        for name, (low, high) in ranges.items():
+            values = self.table.get_column(name, rows)
+            rows = rows[(values >= low) & (values <= high)]
+
+        return self.from_table(
+            self.catalog_type, self.table, rows, self.stats
+        )
+
+    def filter_by_value(self, column_name, value):
+        """Return a view of this object filtered to contain only events
+        that have the given value in the given numeric column.
+
+        For a catalog in the catalog store, the rows are looked up in the
+        group index of the column, so a view of a date range only needs a
+        binary search within the group of the value.
+
+        Keyword arguments:
+        column_name -- Name of the column
+        value -- The value to use for filtering
+        """
+        if self.table is None:
+            return self.select_rows(np.flatnonzero(
+                self.get_column(column_name).to_numpy() == value
+            ))
+
+        return self.from_table(
             self.catalog_type,
-            self.data[(self.dates <= datemax) & (self.dates >= datemin)]
+            self.table,
+            self.stats.get_index(column_name).get_rows(value, self.rows),
+            self.stats
         )
 
     def filter_by_template_id(self, template):
-        """Return a new EarthquakeData object filtered to contain only events
+        """Return a view of this object filtered to contain only events
         that have the given template.
 
         Keyword arguments:
         template -- The template ID to use for filtering
         """
-        return EarthquakeData(
-            self.catalog_type,
-            self.data[self.data['TEMPLATEID'] == template]
-        )
+        return self.filter_by_value('TEMPLATEID', template)
 
     def get_column_params(self, column_name):
         """Return column name, minimum, and maximum as tuple.
@@ -126,13 +445,27 @@ class EarthquakeData:
         column_name -- Name of the column
         """
 
-        params = self.column_params.get(column_name)
+        params = self.stats.get_params(column_name)
 
         if params is None:
             return None
 
         return (column_name, params[0], params[1])
 
+    def get_column_stats(self, column_name):
+        """Return a dictionary with the minimum, maximum, quantiles, number
+        of missing values and number of distinct values of the given column
+        in the whole catalog. The statistics are computed together when
+        first requested and shared by all views of the catalog.
+
+        If the column does not exist, a None value is returned.
+        The same applies to non-numeric columns.
+
+        Keyword arguments:
+        column_name -- Name of the column
+        """
+        return self.stats.get_stats(column_name)
+
     def get_location_uncertainties(self):
         """Return the uncertainty in location for each data point."""
         return 500
@@ -148,17 +481,50 @@ class EarthquakeData:
     def get_weight_matrix(self, x_axis_name, y_axis_name, nbins_x, nbins_y):
         """Return weight matrix and the bins for the heatmap.
 
+        The bins are those of pd.cut over the whole columns, which only
+        depend on the minimum and maximum of each column. The columns are
+        read in two passes over their chunks, see get_column_chunks, one
+        for the extremes and one counting the events of each pair of bins.
+
         Keyword arguments:
         x_axis_name -- Name of the x-axis
         y_axis_name -- Name of the y-axis
         nbins_x -- Number of bins used for x-axis
         nbins_y -- Number of bins used for y-axis
         """
+        names = [x_axis_name, y_axis_name]
+        extremes = [[], []]
+        for chunk in self.get_column_chunks(names):
+            for idx, values in enumerate(chunk):
+                values = pd.Series(values)
+                extremes[idx] += [values.min(), values.max()]
+
+        xcats, xbins = pd.cut(
+            pd.Series(extremes[0]), nbins_x, retbins=True
+        )
+        ycats, ybins = pd.cut(
+            pd.Series(extremes[1]), nbins_y, retbins=True
+        )
 
-        xcats, xbins = pd.cut(self.data[x_axis_name], nbins_x, retbins=True)
-        ycats, ybins = pd.cut(self.data[y_axis_name], nbins_y, retbins=True)
+        counts = np.zeros(nbins_x * nbins_y, dtype=np.int64)
+        for x_values, y_values in self.get_column_chunks(names):
+            x_codes = pd.cut(x_values, xbins).codes.astype(np.int64)
+            y_codes = pd.cut(y_values, ybins).codes.astype(np.int64)
+            binned = (x_codes >= 0) & (y_codes >= 0)
+            counts += np.bincount(
+                x_codes[binned] * nbins_y + y_codes[binned],
+                minlength=len(counts)
+            )
 
-        z = self.data.groupby([xcats, ycats]).size().unstack()
+        z = pd.DataFrame(
+            counts.reshape(nbins_x, nbins_y),
+            index=pd.CategoricalIndex(
+                xcats.cat.categories, name=x_axis_name
+            ),
+            columns=pd.CategoricalIndex(
+                ycats.cat.categories, name=y_axis_name
+            )
+        )
 
         xbins = pd.Series(xbins, name=x_axis_name)
         ybins = pd.Series(ybins, name=y_axis_name)
@@ -174,55 +540,48 @@ class OtaniemiEarthquakeData(EarthquakeData):
     """Internal representation of the Otaniemi catalog data.
     """
 
+    SCHEMA = {
+        'ALTITUDE [m]': 'float32',
+        'M_HEL': 'float32',
+        'M_W': 'float32'
+    }
+
     def __init__(self, data):
         """Parse datetime string to datetime object,
         transform UTM coordinates to latitudes and longitudes,
         and cast strings to floats, where applicable.
         """
         if 'LONGITUDE' not in data.columns:
-            lat_longs = list(map(
-                lambda x: PROJECTION(x[0], x[1], inverse=True),
-                list(zip(
-                    data['EASTING [m]'].to_numpy(),
-                    data['NORTHING [m]'].to_numpy()
-                ))
-            ))
-
-            data = data.assign(
-                LONGITUDE=pd.Series(list(map(lambda x: x[0], lat_longs))),
-                LATITUDE=pd.Series(list(map(lambda x: x[1], lat_longs)))
+            longitudes, latitudes = get_transformer().transform(
+                data['EASTING [m]'].to_numpy(),
+                data['NORTHING [m]'].to_numpy()
             )
+            data = data.assign(LONGITUDE=longitudes, LATITUDE=latitudes)
 
-        data.M_HEL = data.M_HEL.apply(
-            lambda x: float(str(x).replace(',', '.'))
-        )
-        data.M_W = data.M_W.apply(
-            lambda x: float(str(x).replace(',', '.'))
-        )
-
-        EarthquakeData.__init__(self, CatalogTypes.OTA_EXT, data)
+        for column in ['M_HEL', 'M_W']:
+            if data[column].dtype == object:
+                data = data.assign(**{column: pd.to_numeric(
+                    data[column].str.replace(',', '.')
+                )})
 
-        self.dates = data['TIME_UTC'].apply(
-            lambda x: datetime.strptime(x, r'%Y-%m-%dT%H:%M:%S.%fZ')
+        dates = pd.to_datetime(
+            data['TIME_UTC'], format=r'%Y-%m-%dT%H:%M:%S.%fZ'
         )
 
+        EarthquakeData.__init__(self, CatalogTypes.OTA_EXT, data, dates)
+
     def get_eventids(self):
-        return self.data['ID']
+        return self.get_column('ID')
 
     def get_depths(self):
-        return -self.data['ALTITUDE [m]']
+        return -self.get_column('ALTITUDE [m]')
 
     def get_magnitudes(self):
-        return self.data['M_HEL']
+        return self.get_column('M_HEL')
 
     def get_templateids(self):
         return None
 
-    def filter_by_dates(self, datemin, datemax):
-        return OtaniemiEarthquakeData(
-            self.data[(self.dates <= datemax) & (self.dates >= datemin)]
-        )
-
     def filter_by_template_id(self, template):
         return None
 
@@ -230,10 +589,10 @@ class OtaniemiEarthquakeData(EarthquakeData):
         geod = Geod(ellps='WGS84')
         error_coordinates = [
             geod.fwd(
-                self.data['LATITUDE'].to_numpy(),
-                self.data['LONGITUDE'].to_numpy(),
-                self.data['EllipseAzimuth [deg]'].to_numpy() + x[0],
-                self.data[x[1]].to_numpy()
+                self.get_column('LATITUDE').to_numpy(),
+                self.get_column('LONGITUDE').to_numpy(),
+                self.get_column('EllipseAzimuth [deg]').to_numpy() + x[0],
+                self.get_column(x[1]).to_numpy()
             )
             for x in [
                 (0, 'AX1 [m]'), (90, 'AX2 [m]'),
@@ -262,35 +621,38 @@ class BaselEarthquakeData(EarthquakeData):
     """Internal representation of the Basel catalog data.
     """
 
+    SCHEMA = {
+        'LSrc': 'category',
+        'Dep': 'float32',
+        'Mwx': 'float32',
+        'MwGEL': 'float32',
+        'MwSED': 'float32',
+        'MLSED': 'float32',
+        'TpID': 'int32'
+    }
+
     def __init__(self, data):
         data = data[data.LATITUDE.notnull() & data.Mwx.notnull()]
 
-        EarthquakeData.__init__(self, CatalogTypes.DAT_EXT, data)
-        self.dates = data['SourceDateTime'].apply(
-            lambda x: datetime.strptime(x, r'%Y-%m-%dT%H:%M:%S.%f')
+        dates = pd.to_datetime(
+            data['SourceDateTime'], format=r'%Y-%m-%dT%H:%M:%S.%f'
         )
+        EarthquakeData.__init__(self, CatalogTypes.DAT_EXT, data, dates)
 
     def get_eventids(self):
-        return self.data['ID']
+        return self.get_column('ID')
 
     def get_depths(self):
-        return self.data['Dep']
+        return self.get_column('Dep')
 
     def get_magnitudes(self):
-        return self.data['Mwx']
+        return self.get_column('Mwx')
 
     def get_templateids(self):
-        return self.data['TpID'].dropna().unique()
-
-    def filter_by_dates(self, datemin, datemax):
-        return BaselEarthquakeData(
-            self.data[(self.dates <= datemax) & (self.dates >= datemin)]
-        )
+        return self.get_distinct_values('TpID')
 
     def filter_by_template_id(self, template):
-        return BaselEarthquakeData(
-            self.data[self.data['TpID'] == template]
-        )
+        return self.filter_by_value('TpID', template)
 
     def get_map_center(self):
         return [47.585, 7.593]
@@ -306,31 +668,46 @@ class FMEarthquakeData(EarthquakeData):
     """Internal representation of the FM catalog data.
     """
 
+    SCHEMA = {
+        'YEAR': 'int16',
+        'MONTH': 'int8',
+        'DAY': 'int8',
+        'HOUR': 'int8',
+        'MINUTE': 'int8',
+        'SECOND': 'float32',
+        'DEPTH': 'float32',
+        'MAGNITUDE': 'float32',
+        'STRIKE': 'int16',
+        'DIP': 'int16',
+        'RAKE': 'int16',
+        'FPUncert': 'int16',
+        'AFPUncert': 'int16',
+        'FIRSTMOTIONS': 'int16',
+        'MISFIT': 'float32',
+        'SPAMPRATIOS': 'int16',
+        'AVGLOGMISFIT': 'float32',
+        'QUALITY': 'category'
+    }
+
     def __init__(self, data):
-        EarthquakeData.__init__(self, CatalogTypes.SCEDC_EXT, data)
         if 'DateTime' in data.columns:
-            self.dates = data['DateTime']
+            dates = data['DateTime']
         else:
-            self.dates = data.agg(
-                lambda x: get_datetime(
-                    int(x['YEAR']),
-                    int(x['MONTH']),
-                    int(x['DAY']),
-                    int(x['HOUR']),
-                    int(x['MINUTE']),
-                    x['SECOND']
-                ), axis=1)
-            self.dates.rename('DateTime', inplace=True)
-            self.data = self.data.assign(DateTime=self.dates)
+            dates = pd.Series(get_datetimes(
+                data['YEAR'],
+                data['MONTH'],
+                data['DAY'],
+                data['HOUR'],
+                data['MINUTE'],
+                data['SECOND']
+            ), index=data.index, name='DateTime')
+            data = data.assign(DateTime=dates)
+
+        EarthquakeData.__init__(self, CatalogTypes.SCEDC_EXT, data, dates)
 
     def get_templateids(self):
         return None
 
-    def filter_by_dates(self, datemin, datemax):
-        return FMEarthquakeData(
-            self.data[(self.dates <= datemax) & (self.dates >= datemin)]
-        )
-
     def filter_by_template_id(self, template):
         return None
 
@@ -339,69 +716,75 @@ class QTMEarthquakeData(EarthquakeData):
     """Internal representation of the QTM catalog data.
     """
 
+    SCHEMA = {
+        'YEAR': 'int16',
+        'MONTH': 'int8',
+        'DAY': 'int8',
+        'HOUR': 'int8',
+        'MINUTE': 'int8',
+        'SECOND': 'float32',
+        'DEPTH': 'float32',
+        'MAGNITUDE': 'float32',
+        'TEMPLATEID': 'int32'
+    }
+
     def __init__(self, data):
-        EarthquakeData.__init__(self, CatalogTypes.HYPO_EXT, data)
         if 'DateTime' in data.columns:
-            self.dates = data['DateTime']
+            dates = data['DateTime']
         else:
-            self.dates = data.agg(
-                lambda x: get_datetime(
-                    int(x['YEAR']),
-                    int(x['MONTH']),
-                    int(x['DAY']),
-                    int(x['HOUR']),
-                    int(x['MINUTE']),
-                    x['SECOND']
-                ), axis=1)
-            self.dates.rename('DateTime', inplace=True)
-            self.data = self.data.assign(DateTime=self.dates)
-
-    def filter_by_dates(self, datemin, datemax):
-        return QTMEarthquakeData(
-            self.data[(self.dates <= datemax) & (self.dates >= datemin)]
-        )
+            dates = pd.Series(get_datetimes(
+                data['YEAR'],
+                data['MONTH'],
+                data['DAY'],
+                data['HOUR'],
+                data['MINUTE'],
+                data['SECOND']
+            ), index=data.index, name='DateTime')
+            data = data.assign(DateTime=dates)
 
-    def filter_by_template_id(self, template):
-        return QTMEarthquakeData(
-            self.data[self.data['TEMPLATEID'] == template]
-        )
+        EarthquakeData.__init__(self, CatalogTypes.HYPO_EXT, data, dates)
 
 
 class GenericEarthquakeData(EarthquakeData):
     """Internal representation of a generic catalog.
     """
 
+    SCHEMA = {
+        'YEAR': 'int16',
+        'MONTH': 'int8',
+        'DAY': 'int8',
+        'HOUR': 'int8',
+        'MINUTE': 'int8',
+        'SECOND': 'float32',
+        'DEPTH': 'float32',
+        'MAGNITUDE': 'float32'
+    }
+
     def __init__(self, data):
-        EarthquakeData.__init__(self, CatalogTypes.TXT_EXT, data)
         if 'DateTime' in data.columns:
-            self.dates = data['DateTime']
+            dates = data['DateTime']
         else:
-            self.dates = data.agg(
-                lambda x: get_datetime(
-                    int(x['YEAR']),
-                    int(x['MONTH']),
-                    int(x['DAY']),
-                    int(x['HOUR']),
-                    int(x['MINUTE']),
-                    x['SECOND']
-                ), axis=1)
-            self.dates.rename('DateTime', inplace=True)
-            self.data = self.data.assign(DateTime=self.dates)
+            dates = pd.Series(get_datetimes(
+                data['YEAR'],
+                data['MONTH'],
+                data['DAY'],
+                data['HOUR'],
+                data['MINUTE'],
+                data['SECOND']
+            ), index=data.index, name='DateTime')
+            data = data.assign(DateTime=dates)
+
+        EarthquakeData.__init__(self, CatalogTypes.TXT_EXT, data, dates)
 
     def get_eventids(self):
-        return self.data['ID']
+        return self.get_column('ID')
 
     def get_depths(self):
-        return self.data['DEPTH']
+        return self.get_column('DEPTH')
 
     def get_templateids(self):
         return None
 
-    def filter_by_dates(self, datemin, datemax):
-        return GenericEarthquakeData(
-            self.data[(self.dates <= datemax) & (self.dates >= datemin)]
-        )
-
     def filter_by_template_id(self, template):
         return None
 
@@ -416,32 +799,53 @@ class FENCATEarthquakeData(EarthquakeData):
     """Internal representation of the FENCAT catalog data.
     """
 
-    def __init__(self, data):
-        EarthquakeData.__init__(self, CatalogTypes.FEN_EXT, data)
+    SCHEMA = {
+        'SOURCE': 'category',
+        'QUESTIONABLE ORIGIN': 'category',
+        'YEAR': 'int16',
+        'MONTH': 'int8',
+        'DAY': 'int8',
+        'HOUR': 'int8',
+        'MINUTE': 'int8',
+        'SECOND': 'float32',
+        'STATUS': 'category',
+        'TIME UNCERTAINTY': 'category',
+        'LOCATION UNCERTAINTY': 'category',
+        'DEPTH': 'float32',
+        'DEPTH ID CODE': 'category',
+        'MAGNITUDE': 'float32',
+        'MAG SCALE': 'category',
+        'MAGNITUDE2': 'float32',
+        'MAG2 SCALE': 'category',
+        'MAGNITUDE3': 'float32',
+        'MAG3 SCALE': 'category',
+        'MAX INTENSITY': 'float32',
+        'INTENSITY STATUS': 'category',
+        'MACROSEISMIC REF': 'float32',
+        'MEAN RADIUS': 'float32',
+        'REGION': 'category',
+        'NUM STATIONS': 'float32',
+        'MAX AZIMUTH GAP': 'float32',
+        'MIN STATION DIST': 'float32'
+    }
 
+    def __init__(self, data):
         if 'DateTime' in data.columns:
-            self.dates = data['DateTime'].apply(
-                lambda x: datetime.strptime(x, '%Y-%m-%d %H:%M:%S.%f')
+            dates = pd.to_datetime(
+                data['DateTime'], format='%Y-%m-%d %H:%M:%S.%f'
             )
         else:
-            self.dates = data.agg(
-                lambda x: get_datetime(
-                    x['YEAR'],
-                    int(self.get_number(x['MONTH'])),
-                    int(self.get_number(x['DAY'])),
-                    int(self.get_number(x['HOUR'])),
-                    int(self.get_number(x['MINUTE'])),
-                    self.get_number(x['SECOND'])
-                ), axis=1)
-            self.dates.rename('DateTime', inplace=True)
-            self.data = self.data.assign(DateTime=self.dates.apply(
-                lambda x: x.strftime('%Y-%m-%d %H:%M:%S.%f')
-            ))
-
-    def get_number(self, x, default=1):
-        if np.isnan(x):
-            return default
-        return x
+            dates = pd.Series(get_datetimes(
+                data['YEAR'],
+                data['MONTH'].fillna(1),
+                data['DAY'].fillna(1),
+                data['HOUR'].fillna(1),
+                data['MINUTE'].fillna(1),
+                data['SECOND'].fillna(1)
+            ), index=data.index, name='DateTime')
+            data = data.assign(DateTime=dates)
+
+        EarthquakeData.__init__(self, CatalogTypes.FEN_EXT, data, dates)
 
     def get_templateids(self):
         return None
@@ -453,14 +857,16 @@ class FENCATEarthquakeData(EarthquakeData):
         return 4
 
     def get_location_uncertainties(self):
-        errors = self.data['LOCATION UNCERTAINTY'].apply(
+        errors = self.get_column('LOCATION UNCERTAINTY').apply(
             lambda x: LOCATION_UNCERTAINTY[x]
         ).to_numpy()
+        latitudes = self.get_column('LATITUDE').to_numpy()
+        longitudes = self.get_column('LONGITUDE').to_numpy()
 
         error_coordinates = np.array([
             list(zip(
-                self.data['LATITUDE'].to_numpy() + direction[0] * errors,
-                self.data['LONGITUDE'].to_numpy() + direction[1] * errors,
+                latitudes + direction[0] * errors,
+                longitudes + direction[1] * errors,
             ))
             for direction in DIRECTIONS
         ])
@@ -471,11 +877,6 @@ class FENCATEarthquakeData(EarthquakeData):
 
         return error_coordinates
 
-    def filter_by_dates(self, datemin, datemax):
-        return FENCATEarthquakeData(
-            self.data[(self.dates <= datemax) & (self.dates >= datemin)]
-        )
-
     def filter_by_template_id(self, template):
         return None
 
@@ -494,37 +895,164 @@ EXTENSIONS = {
 }
 
 
-# Cache timeout set to 10 hours.
-@cache.memoize(timeout=36000)
 def get_earthquake_data(session_id):
-    """Return uploaded data saved on the server as an EarthquakeData object
-    and remove temporary files holding the data. The dataframe contained by
-    the object is empty if no data has been uploaded.
+    """Return uploaded data saved on the server as an EarthquakeData object.
+    The object is backed by the memory mapped columns of the catalog store
+    and cached for the current process under the real path of the stored
+    catalog, so sessions referring to the same shared catalog also share
+    the object, with its dataframe, statistics and group indexes. The
+    stored catalog is kept until
+    it has not been used for SESSION_TTL seconds. The dataframe contained
+    by the object is empty if no data has been uploaded.
 
     Keyword arguments:
     session_id -- ID of the current session
     """
     try:
-        if os.path.exists(TEMP_FILE_EXT % session_id):
-            with open(TEMP_FILE_EXT % session_id, 'r') as file_in:
-                extension = file_in.read()
-            data = pd.read_json(TEMP_FILE_DF % session_id)
-
-            os.remove(TEMP_FILE_DF % session_id)
-            os.remove(TEMP_FILE_EXT % session_id)
-
-            catalog_type = CatalogTypes(extension)
+        path = get_session_path(session_id)
+        version = catalog_store.get_version(path)
+        if version is None:
+            return EarthquakeData('', pd.DataFrame())
+
+        catalog_store.touch_catalog(path)
+        catalog_path = os.path.realpath(path)
+        eq_data = catalog_cache.get(catalog_path, 'catalog', version)
+        if eq_data is None:
+            table = catalog_store.load_catalog(catalog_path)
+            catalog_type = CatalogTypes(table.catalog_type)
             data_wrapper = EXTENSIONS[catalog_type]
-            return data_wrapper(data)
+            eq_data = data_wrapper.from_table(catalog_type, table)
+            catalog_cache.set(
+                catalog_path, 'catalog', table.version, eq_data
+            )
 
-        return EarthquakeData('', pd.DataFrame())
+        return eq_data
 
     except Exception as ex:
         print(os.path.basename(__file__), ':', ex)
         return EarthquakeData('', pd.DataFrame())
 
 
-@cache.memoize(timeout=36000)
 def get_earthquake_data_by_dates(session_id, datemin, datemax):
     eq_data = get_earthquake_data(session_id)
-    return eq_data.filter_by_dates(datemin, datemax)
+    if eq_data.table is None:
+        return eq_data.filter_by_dates(datemin, datemax)
+
+    key = ('dates', datemin, datemax)
+    version = eq_data.table.version
+    filtered_data = catalog_cache.get(session_id, key, version)
+    if filtered_data is None:
+        filtered_data = eq_data.filter_by_dates(datemin, datemax)
+        catalog_cache.set(session_id, key, version, filtered_data)
+
+    return filtered_data
+
+
+def get_session_path(session_id):
+    """Return the path of the catalog of the given session in the catalog
+    store. Raise an exception if the session ID is not valid, so that no
+    path outside the sessions directory can be built from it.
+
+    Keyword arguments:
+    session_id -- ID of the current session
+    """
+    if not session.is_session_id(session_id):
+        raise Exception('Invalid session ID: {!r}'.format(session_id))
+
+    return SESSION_CATALOG_DIR % session_id
+
+
+def apply_schema(data, schema):
+    """Return the data with its columns converted to the compact dtypes of
+    the given schema. Integer columns with missing or fractional values
+    are converted to float32 instead. Columns that are missing from the
+    data or whose values do not fit the dtype are left as they are.
+
+    Keyword arguments:
+    data -- Pandas dataframe containing the catalog
+    schema -- Dictionary of column names and dtypes
+    """
+    dtypes = {}
+    for name, dtype in schema.items():
+        if name not in data.columns or data[name].dtype == dtype:
+            continue
+
+        column = data[name]
+        if dtype != 'category':
+            if column.dtype.kind not in 'biuf':
+                continue
+
+            values = column.to_numpy()
+            if np.dtype(dtype).kind == 'i' and len(values) > 0:
+                info = np.iinfo(dtype)
+                if not np.isfinite(values).all() or \
+                        (values != np.round(values)).any():
+                    dtype = 'float32'
+                elif values.min() < info.min or values.max() > info.max:
+                    continue
+
+        dtypes[name] = dtype
+
+    return data.astype(dtypes) if dtypes else data
+
+
+def get_display_data(data):
+    """Return the data with float32 columns converted to float64 by their
+    shortest decimal representation, so that the values are shown as in
+    the catalog file, e.g. 2.35 instead of 2.3499999046325684. Only the
+    float32 columns are converted, see get_decimal_values.
+
+    Keyword arguments:
+    data -- Pandas dataframe to display
+    """
+    names = data.select_dtypes(np.float32).columns
+    if len(names) == 0:
+        return data
+
+    return data.assign(**{
+        name: get_decimal_values(data[name].to_numpy()) for name in names
+    })
+
+
+@lru_cache(maxsize=None)
+def get_transformer():
+    """Return the transformer from the projected coordinates of the
+    Otaniemi catalog to longitudes and latitudes. The transformer is built
+    on first use and reused for all catalogs.
+    """
+    crs = CRS.from_epsg(PROJECTION_EPSG)
+    return Transformer.from_crs(crs, crs.geodetic_crs, always_xy=True)
+
+
+def combine_rows(rows, selection):
+    """Return the rows of a table selected by a selection made on a subset
+    of the table.
+
+    Keyword arguments:
+    rows -- A slice or an array of row positions defining the subset,
+        or None if the subset contains the whole table
+    selection -- A slice or an array of row positions in the subset
+    """
+    if rows is None:
+        return selection
+
+    if isinstance(rows, slice):
+        if isinstance(selection, slice):
+            return slice(
+                rows.start + selection.start, rows.start + selection.stop
+            )
+        return selection + rows.start
+
+    return rows[selection]
+
+
+sweeper = catalog_store.start_sweeper(
+    [
+        os.path.dirname(SESSION_CATALOG_DIR),
+        os.path.dirname(SHARED_CATALOG_DIR),
+        UPLOAD_DIR
+    ],
+    SESSION_TTL,
+    SWEEP_INTERVAL,
+    STORE_DIR
+)
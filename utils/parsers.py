@@ -1,30 +1,67 @@
 import io
 import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 import pandas as pd
 
+# Fields of the rows of a FENCAT catalog as (name, start, end) tuples. The
+# last three fields are only present in rows of 91 characters.
+FENCAT_FIELDS = [
+    ('SOURCE', 0, 3), ('QUESTIONABLE ORIGIN', 3, 4), ('YEAR', 4, 8),
+    ('MONTH', 8, 10), ('DAY', 10, 12), ('STATUS', 12, 13), ('HOUR', 13, 15),
+    ('MINUTE', 15, 17), ('SECOND', 17, 21), ('LATITUDE', 21, 28),
+    ('LONGITUDE', 28, 36), ('TIME UNCERTAINTY', 36, 37),
+    ('LOCATION UNCERTAINTY', 37, 38), ('DEPTH', 38, 41),
+    ('DEPTH ID CODE', 41, 42), ('MAGNITUDE', 42, 45), ('MAG SCALE', 45, 47),
+    ('MAGNITUDE2', 47, 50), ('MAG2 SCALE', 50, 52), ('MAGNITUDE3', 52, 55),
+    ('MAG3 SCALE', 55, 57), ('MAX INTENSITY', 66, 70),
+    ('INTENSITY STATUS', 70, 71), ('MACROSEISMIC REF', 71, 74),
+    ('MEAN RADIUS', 74, 77), ('REGION', 77, 78), ('NUM STATIONS', 78, 82),
+    ('MAX AZIMUTH GAP', 83, 86), ('MIN STATION DIST', 86, None)
+]
+# Lengths of the two row layouts of a FENCAT catalog without surrounding
+# whitespace. Other rows are skipped.
+FENCAT_ROW_LENGTHS = [78, 91]
+# Fields of only spaces are missing values if they have one of these
+# widths, as with the na_values used by the other parsers
+FIXED_WIDTH_NA_WIDTHS = [0, 2, 3, 4]
+# Lookup tables of the bytes removed by str.strip and of the bytes that
+# can appear in a number field padded with zeros
+WHITESPACE = np.isin(
+    np.arange(256), np.frombuffer(b' \t\n\r\x0b\x0c\x1c\x1d\x1e\x1f', np.uint8)
+)
+NUMBER_BYTES = np.isin(
+    np.arange(256), np.frombuffer(b'\x00 +-.0123456789', np.uint8)
+)
+
 
-def qtm_parse(contents):
+def qtm_parse(contents, dtype=None):
     """Return a dataframe containing the parsed QTM catalog.
 
     Keyword arguments:
-    contents -- Decoded contents of uploaded file
+    contents -- Decoded contents of the uploaded file or a binary file object
+    dtype -- Data types of some or all columns, inferred if not given
     """
     df = pd.read_table(
-        io.StringIO(contents),
-        sep=r'\s+'
+        get_buffer(contents),
+        sep=r'\s+',
+        dtype=dtype
     )
     return df
 
 
-def fm_parse(contents):
+def fm_parse(contents, dtype=None):
     """Return a dataframe containing the parsed FM catalog.
 
     Keyword arguments:
-    contents -- Decoded contents of the uploaded file
+    contents -- Decoded contents of the uploaded file or a binary file object
+    dtype -- Data types of some or all columns, inferred if not given
     """
     df = pd.read_table(
-        io.StringIO(contents),
+        get_buffer(contents),
         sep=r'\s+',
+        dtype=dtype,
         names=[
             'YEAR', 'MONTH', 'DAY', 'HOUR', 'MINUTE', 'SECOND', 'EVENTID',
             'LATITUDE', 'LONGITUDE', 'DEPTH', 'MAGNITUDE', 'STRIKE', 'DIP',
@@ -39,10 +76,10 @@ def otaniemi_parse(contents):
     """Return a dataframe containing the parsed Otaniemi catalog.
 
     Keyword arguments:
-    contents -- Decoded contents of the uploaded file
+    contents -- Decoded contents of the uploaded file or a binary file object
     """
     df = pd.read_csv(
-        io.StringIO(contents),
+        get_buffer(contents),
         sep=';',
         converters={
             'EASTING [m]': convert_to_float,
@@ -55,20 +92,17 @@ def otaniemi_parse(contents):
 
 
 def basel_parse(contents):
-    """Return a dataframe containing the parsed Basel catalog.
+    """Return a dataframe containing the parsed Basel catalog. Comment
+    lines starting with # and blank lines are skipped by the tokenizer.
 
     Keyword arguments:
-    contents -- Decoded contents of the uploaded file
+    contents -- Decoded contents of the uploaded file or a binary file object
     """
-
-    rows = list(filter(
-        lambda row: not row.startswith('#') and not len(row) == 0,
-        contents.split('\n')
-    ))
-
     df = pd.read_csv(
-        io.StringIO('\n'.join(rows)),
+        get_buffer(contents),
         sep=r'\s+',
+        comment='#',
+        skip_blank_lines=True,
         names=[
             'SourceDateTime', 'LSrc', 'LATITUDE', 'LONGITUDE', 'Dep', 'X', 'Y',
             'Z', 'Mwx', 'MwGEL', 'MwSED', 'MLSED', 'ID', 'TpID', 'GELID',
@@ -82,15 +116,17 @@ def basel_parse(contents):
     return df
 
 
-def generic_parse(contents):
+def generic_parse(contents, dtype=None):
     """Return a dataframe containing the parsed catalog.
 
     Keyword arguments:
-    contents -- Decoded contents of the uploaded file
+    contents -- Decoded contents of the uploaded file or a binary file object
+    dtype -- Data types of some or all columns, inferred if not given
     """
     df = pd.read_table(
-        io.StringIO(contents),
+        get_buffer(contents),
         sep=',',
+        dtype=dtype,
         names=[
             'ID', 'YEAR', 'MONTH', 'DAY', 'HOUR', 'MINUTE', 'SECOND',
             'DEPTH', 'MAGNITUDE', 'LATITUDE', 'LONGITUDE'
@@ -102,49 +138,347 @@ def generic_parse(contents):
 def fencat_parse(contents):
     """Return a dataframe containing the parsed FENCAT catalog.
 
+    The fields of both row layouts are cut out of the file with one pass
+    over its bytes, see get_fixed_width_columns.
+
     Keyword arguments:
-    contents -- Decoded contents of the uploaded file
-    """
-    rows = list(map(
-        lambda row: '\t'.join([
-            row[:3], row[3], row[4:8], row[8:10], row[10:12], row[12],
-            row[13:15], row[15:17], row[17:21], row[21:28], row[28:36],
-            row[36], row[37], row[38:41], row[41], row[42:45], row[45:47],
-            row[47:50], row[50:52], row[52:55], row[55:57], row[66:70],
-            row[70], row[71:74], row[74:77], row[77], '', '', ''
-        ]),
-        filter(lambda r: len(r.strip()) == 78, contents.split('\n'))
-    ))
-
-    rows.extend(list(map(
-        lambda row: '\t'.join([
-            row[:3], row[3], row[4:8], row[8:10], row[10:12], row[12],
-            row[13:15], row[15:17], row[17:21], row[21:28], row[28:36],
-            row[36], row[37], row[38:41], row[41], row[42:45], row[45:47],
-            row[47:50], row[50:52], row[52:55], row[55:57], row[66:70],
-            row[70], row[71:74], row[74:77], row[77], row[78:82],
-            row[83:86], row[86:]
-        ]),
-        filter(lambda r: len(r.strip()) == 91, contents.split('\n'))
-    )))
+    contents -- Decoded contents of the uploaded file or a binary file object
+    """
+    buffer = np.frombuffer(get_bytes(contents), dtype=np.uint8)
+    starts, ends = get_line_bounds(buffer)
+    lengths = get_stripped_lengths(buffer, starts, ends)
 
-    df = pd.read_table(
-        io.StringIO('\n'.join(rows)),
-        sep='\t',
-        names=[
-            'SOURCE', 'QUESTIONABLE ORIGIN', 'YEAR', 'MONTH', 'DAY', 'STATUS',
-            'HOUR', 'MINUTE', 'SECOND', 'LATITUDE', 'LONGITUDE',
-            'TIME UNCERTAINTY', 'LOCATION UNCERTAINTY', 'DEPTH',
-            'DEPTH ID CODE', 'MAGNITUDE', 'MAG SCALE', 'MAGNITUDE2',
-            'MAG2 SCALE', 'MAGNITUDE3', 'MAG3 SCALE', 'MAX INTENSITY',
-            'INTENSITY STATUS', 'MACROSEISMIC REF', 'MEAN RADIUS', 'REGION',
-            'NUM STATIONS', 'MAX AZIMUTH GAP', 'MIN STATION DIST'
-        ],
-        na_values=['  ', '   ', '    ']
-    ).reset_index().rename(columns={'index': 'ID'})
+    rows = np.concatenate([
+        np.flatnonzero(lengths == length) for length in FENCAT_ROW_LENGTHS
+    ])
+    df = pd.DataFrame(
+        get_fixed_width_columns(
+            buffer, starts[rows], ends[rows], lengths[rows], FENCAT_FIELDS
+        ),
+        columns=[field[0] for field in FENCAT_FIELDS]
+    )
+    df.insert(0, 'ID', np.arange(df.shape[0], dtype=np.int64))
     return df
 
 
+def get_bytes(contents):
+    """Return the given contents as bytes.
+
+    Keyword arguments:
+    contents -- Decoded contents of the uploaded file or a binary file object
+    """
+    if isinstance(contents, str):
+        return contents.encode('utf-8')
+    return contents.read()
+
+
+def get_line_bounds(buffer):
+    """Return arrays of the start and end positions of the lines in the
+    given byte array. Line ends exclude the newline and a carriage return
+    before it.
+
+    Keyword arguments:
+    buffer -- Numpy array containing the bytes of a file
+    """
+    newlines = np.flatnonzero(buffer == ord('\n'))
+    starts = np.concatenate(([0], newlines + 1))
+    ends = np.concatenate((newlines, [len(buffer)]))
+
+    carriage_returns = ends > starts
+    carriage_returns[carriage_returns] = \
+        buffer[ends[carriage_returns] - 1] == ord('\r')
+    return starts, ends - carriage_returns
+
+
+def get_stripped_lengths(buffer, starts, ends):
+    """Return the lengths of the given lines without leading and trailing
+    whitespace.
+
+    Keyword arguments:
+    buffer -- Numpy array containing the bytes of a file
+    starts -- Array of the start positions of the lines
+    ends -- Array of the end positions of the lines
+    """
+    starts, ends = starts.copy(), ends.copy()
+
+    # Only lines that still start or end with whitespace are stepped over
+    lines = np.flatnonzero(starts < ends)
+    while len(lines) > 0:
+        lines = lines[WHITESPACE[buffer[starts[lines]]]]
+        starts[lines] += 1
+        lines = lines[starts[lines] < ends[lines]]
+
+    lines = np.flatnonzero(starts < ends)
+    while len(lines) > 0:
+        lines = lines[WHITESPACE[buffer[ends[lines] - 1]]]
+        ends[lines] -= 1
+        lines = lines[starts[lines] < ends[lines]]
+
+    return ends - starts
+
+
+def get_fixed_width_columns(buffer, starts, ends, lengths, fields):
+    """Return a dictionary of the columns of the given fixed width rows.
+
+    The rows are copied once into a byte matrix, and each field is a slice
+    of the matrix covering all rows. As with pd.read_table, a column is
+    numeric if all of its values are numbers and integer if none of them
+    is missing, and fields that are empty or consist of two to four spaces
+    are missing values.
+
+    Keyword arguments:
+    buffer -- Numpy array containing the bytes of a file
+    starts -- Array of the start positions of the rows
+    ends -- Array of the end positions of the rows
+    lengths -- Array of the row lengths without surrounding whitespace,
+    fields starting beyond the length are missing
+    fields -- List of (name, start, end) tuples, an end of None meaning
+    the end of the row
+    """
+    chars = get_chars(buffer, starts, ends)
+    columns = {}
+    for name, field_start, field_end in fields:
+        present = lengths > field_start
+        field_chars = chars[field_start:field_end]
+        if len(field_chars) == 0:
+            field_chars = np.zeros((1, len(starts)), dtype=np.uint8)
+        elif not present.all():
+            field_chars = field_chars * present
+
+        widths = np.clip(ends - starts, field_start, field_end) - field_start
+        missing = np.isin(widths * present, FIXED_WIDTH_NA_WIDTHS) & \
+            ((field_chars == ord(' ')) | (field_chars == 0)).all(axis=0)
+        columns[name] = get_fixed_width_values(field_chars, missing)
+
+    return columns
+
+
+def get_chars(buffer, starts, ends):
+    """Return a matrix of the bytes of the given rows, padded with zeros.
+    Row i of the matrix holds byte i of every given row.
+
+    Keyword arguments:
+    buffer -- Numpy array containing the bytes of a file
+    starts -- Array of the start positions of the rows
+    ends -- Array of the end positions of the rows
+    """
+    lengths = ends - starts
+    chars = np.zeros((lengths.max(initial=0), len(starts)), dtype=np.uint8)
+    for idx, row in enumerate(chars):
+        buffer.take(starts + idx, out=row, mode='clip')
+        row *= lengths > idx
+    return chars
+
+
+def get_fixed_width_values(chars, missing):
+    """Return the values of a fixed width column, converted to numbers if
+    all of them are numbers.
+
+    Keyword arguments:
+    chars -- Byte matrix of the fields, row i holding byte i of every field
+    missing -- Boolean array indicating the missing values
+    """
+    present = ~missing
+    if NUMBER_BYTES.take(chars).all(axis=0)[present].all():
+        numbers, integer, valid = get_numbers(chars)
+
+        if valid[present].all():
+            if integer.all():
+                return numbers.astype(np.int64)
+            numbers[missing] = np.nan
+            return numbers
+
+    # Columns of strings have few distinct values, which are decoded once
+    values = np.ascontiguousarray(chars.T).view('S%d' % len(chars)).ravel()
+    if len(chars) <= 8:
+        keys = np.zeros(len(values), dtype=np.uint64)
+        for char in chars:
+            keys = keys << np.uint64(8) | char
+        inverse, keys = pd.factorize(keys)
+        first = np.empty(len(keys), dtype=np.int64)
+        first[inverse[::-1]] = np.arange(len(inverse))[::-1]
+        values = values[first]
+    else:
+        values, inverse = np.unique(values, return_inverse=True)
+    strings = np.char.decode(values, 'utf-8').astype(object)[inverse]
+    strings[missing] = np.nan
+    try:
+        # Numbers in a form not handled by get_numbers, e.g. exponents
+        return pd.to_numeric(strings).to_numpy()
+    except (ValueError, TypeError):
+        return strings
+
+
+def get_numbers(chars):
+    """Parse the given fields as decimal numbers surrounded by spaces.
+    Return arrays of the numbers and of booleans indicating whether each
+    field is an integer and whether it is a number at all.
+
+    Keyword arguments:
+    chars -- Byte matrix of the fields, row i holding byte i of every field
+    """
+    count = chars.shape[1]
+    mantissa = np.zeros(count, dtype=np.int64)
+    decimals = np.zeros(count, dtype=np.int64)
+    digit_count = np.zeros(count, dtype=np.int64)
+    negative = np.zeros(count, dtype=bool)
+    has_point = np.zeros(count, dtype=bool)
+    started = np.zeros(count, dtype=bool)
+    ended = np.zeros(count, dtype=bool)
+    valid = np.ones(count, dtype=bool)
+
+    for char in chars:
+        digit = char - np.uint8(ord('0'))
+        is_digit = digit < 10
+        is_point = char == ord('.')
+        is_sign = (char == ord('-')) | (char == ord('+'))
+        is_space = (char == ord(' ')) | (char == 0)
+
+        # A sign may only start the number, and the characters of the
+        # number may not be separated by spaces
+        valid &= (is_digit | is_point | is_sign | is_space) & \
+            ~(is_sign & started) & ~(is_point & has_point) & \
+            ~(ended & ~is_space)
+        ended |= started & is_space
+        started |= ~is_space
+
+        mantissa = np.where(is_digit, mantissa * 10 + digit, mantissa)
+        decimals += is_digit & has_point
+        digit_count += is_digit
+        negative |= char == ord('-')
+        has_point |= is_point
+
+    valid &= (digit_count > 0) & (digit_count < 16)
+    numbers = mantissa / 10.0 ** decimals
+    numbers[negative] *= -1
+    return numbers, valid & ~has_point, valid
+
+
+def parse_chunked(parser, path, header_lines, chunk_size, workers):
+    """Return a dataframe containing the catalog in the given file, parsed
+    in chunks of whole lines by a pool of processes. The chunks are
+    concatenated in their order in the file.
+
+    The types of the columns are inferred in each chunk. A column of text
+    in some chunk is text in the whole file, so the chunks where it was
+    read as numbers are parsed again with the column as text, keeping
+    e.g. the leading zeros of IDs as a single pass would.
+
+    Keyword arguments:
+    parser -- Parser of a line based format, e.g. qtm_parse
+    path -- Path of the catalog file
+    header_lines -- Number of header lines, which are parsed with every
+    chunk
+    chunk_size -- Approximate size of a chunk in bytes
+    workers -- Number of worker processes
+    """
+    with open(path, 'rb') as f:
+        header_end = len(b''.join(f.readline() for _ in range(header_lines)))
+
+    bounds = get_chunk_bounds(path, header_end, chunk_size)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        frames = list(executor.map(
+            parse_chunk,
+            [parser] * len(bounds),
+            [path] * len(bounds),
+            [header_end] * len(bounds),
+            *zip(*bounds)
+        ))
+
+        text_columns = get_text_columns(frames)
+        chunks = [
+            chunk for chunk, frame in enumerate(frames)
+            if not all(is_text(frame[name]) for name in text_columns)
+        ]
+        dtype = {name: str for name in text_columns}
+        for chunk, frame in zip(chunks, executor.map(
+                parse_chunk,
+                [parser] * len(chunks),
+                [path] * len(chunks),
+                [header_end] * len(chunks),
+                *zip(*[bounds[chunk] for chunk in chunks]),
+                [dtype] * len(chunks))):
+            frames[chunk] = frame
+
+    return pd.concat(frames, ignore_index=True)
+
+
+def get_text_columns(frames):
+    """Return the names of the columns that are text in some of the given
+    dataframes but not in all of them.
+
+    Keyword arguments:
+    frames -- List of dataframes with the same columns
+    """
+    return [
+        name for name in frames[0].columns
+        if 0 < sum(is_text(frame[name]) for frame in frames) < len(frames)
+    ]
+
+
+def is_text(column):
+    """Return whether the given column was read as text rather than as
+    numbers.
+
+    Keyword arguments:
+    column -- pandas series
+    """
+    return not pd.api.types.is_numeric_dtype(column.dtype)
+
+
+def get_chunk_bounds(path, start, chunk_size):
+    """Return a list of (start, end) byte ranges of approximately the given
+    size that split the given file on line boundaries.
+
+    Keyword arguments:
+    path -- Path of the file
+    start -- Position to start from, e.g. the end of the header
+    chunk_size -- Approximate size of a chunk in bytes
+    """
+    bounds = []
+    with open(path, 'rb') as f:
+        f.seek(0, io.SEEK_END)
+        size = f.tell()
+
+        while start < size:
+            f.seek(min(start + chunk_size, size))
+            f.readline()
+            end = min(f.tell(), size)
+            bounds.append((start, end))
+            start = end
+
+    return bounds
+
+
+def parse_chunk(parser, path, header_end, start, end, dtype=None):
+    """Return a dataframe containing the lines in the given byte range of
+    the file, parsed together with the header of the file.
+
+    Keyword arguments:
+    parser -- Parser of a line based format, e.g. qtm_parse
+    path -- Path of the catalog file
+    header_end -- End position of the header
+    start -- Start position of the chunk
+    end -- End position of the chunk
+    dtype -- Data types of some or all columns, inferred if not given
+    """
+    with open(path, 'rb') as f:
+        header = f.read(header_end)
+        f.seek(start)
+        return parser(io.BytesIO(header + f.read(end - start)), dtype)
+
+
+def get_buffer(contents):
+    """Return a file object to read the given contents from.
+
+    Keyword arguments:
+    contents -- Decoded contents of the uploaded file or a binary file object
+    """
+    if isinstance(contents, str):
+        return io.StringIO(contents)
+    return contents
+
+
 def convert_to_float(x):
     """Convert a string to float, replacing commas with points."""
     return float(x.replace(',', '.'))
@@ -1,17 +1,54 @@
 import uuid
 
 from dash import callback_context
-from flask import request
+from flask import request, after_this_request
+
+SESSION_COOKIE = 'quakewatch_session_id'
 
 
 def get_session_id():
-    """Return the session ID from a cookie or None if not found."""
-    return request.cookies.get('quakewatch_session_id')
+    """Return the session ID from a cookie or None if not found or if the
+    cookie does not hold a valid session ID.
+    """
+    session_id = request.cookies.get(SESSION_COOKIE)
+    if not is_session_id(session_id):
+        return None
+
+    return session_id
 
 
 def generate_session_id():
     """Generate a unique ID and set it as a cookie."""
     session_id = str(uuid.uuid4())
     callback_context.response.set_cookie(
-       'quakewatch_session_id', session_id)
+       SESSION_COOKIE, session_id)
+    return session_id
+
+
+def generate_request_session_id():
+    """Generate a unique ID and set it as a cookie of the response to the
+    current request. Used outside of Dash callbacks, e.g. in Flask routes.
+    """
+    session_id = str(uuid.uuid4())
+
+    @after_this_request
+    def set_cookie(response):
+        response.set_cookie(SESSION_COOKIE, session_id)
+        return response
+
     return session_id
+
+
+def is_session_id(session_id):
+    """Return boolean indicating whether the given value is a session ID
+    as generated by generate_session_id, i.e. a UUID in its canonical
+    form. Session IDs are used in paths of the catalog store, so no other
+    value may be used as one.
+
+    Keyword arguments:
+    session_id -- Value to check
+    """
+    try:
+        return str(uuid.UUID(session_id)) == session_id
+    except (AttributeError, TypeError, ValueError):
+        return False
@@ -20,14 +20,17 @@ def get_layout(session_id):
     """
     eq_data = earthquake_data.get_earthquake_data(session_id)
 
-    if eq_data is None or eq_data.data.shape == (0, 0):
+    if eq_data is None or eq_data.get_row_count() == 0:
         return 'No uploaded data found'
 
     start_date, end_date = eq_data.get_daterange()
     filtered_data = eq_data.filter_by_dates(start_date, end_date)
 
-    default_x = filtered_data.get_magnitudes()
-    default_y = filtered_data.get_depths()
+    # The names of the default columns are taken from an empty view, so
+    # that the columns are only read by get_weight_matrix
+    empty_data = filtered_data.select_rows(slice(0, 0))
+    default_x = empty_data.get_magnitudes()
+    default_y = empty_data.get_depths()
 
     default_nbins_x = 40
     default_nbins_y = 40
@@ -48,8 +51,7 @@ def get_layout(session_id):
             ),
             dbc.Col(heatmap_config.get_component(
                  start_date, end_date,
-                 eq_data.data.select_dtypes(
-                     include=['number', 'datetime']).columns,
+                 eq_data.get_columns(include=['number', 'datetime']),
                  default_x.name, default_y.name,
                  default_nbins_x, default_nbins_y))
         ])
@@ -88,11 +90,8 @@ def update_output(clicks, x_axis, y_axis,
     eq_data = earthquake_data.get_earthquake_data(session_id)
     filtered_data = eq_data.filter_by_dates(start_date, end_date)
 
-    x_axis = filtered_data.data[x_axis]
-    y_axis = filtered_data.data[y_axis]
-
     z, xbins, ybins = filtered_data.get_weight_matrix(
-        x_axis.name, y_axis.name, nbins_x, nbins_y
+        x_axis, y_axis, nbins_x, nbins_y
     )
 
     return heatmap.get_component(z, xbins, ybins)
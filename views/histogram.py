@@ -21,7 +21,7 @@ def get_layout(session_id):
     """
     eq_data = earthquake_data.get_earthquake_data(session_id)
 
-    if eq_data is None or eq_data.data.shape == (0, 0):
+    if eq_data is None or eq_data.get_row_count() == 0:
         return 'No uploaded data found'
 
     start_date, end_date = eq_data.get_daterange()
@@ -48,7 +48,7 @@ def get_layout(session_id):
                 )
             ),
             dbc.Col(histogram_config.get_component(
-                eq_data.data.columns, start_date, end_date,
+                eq_data.get_columns(), start_date, end_date,
                 default_end_date, default_column.name))
         ])
     ]))
@@ -81,7 +81,7 @@ def update_output(clicks, column, nbins, start_date, end_date):
     eq_data = earthquake_data.get_earthquake_data(session_id)
     filtered_data = eq_data.filter_by_dates(start_date, end_date)
 
-    column = filtered_data.data[column]
+    column = filtered_data.get_column(column)
     return histogram.get_component(column, nbins)
 
 
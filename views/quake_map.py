@@ -30,7 +30,7 @@ def get_layout(session_id):
     """
 
     eq_data = earthquake_data.get_earthquake_data(session_id)
-    if eq_data.data.shape[0] != 0:
+    if eq_data.get_row_count() != 0:
         start_date, end_date = eq_data.get_daterange()
         start_date = start_date.replace(hour=0, minute=0, second=0,
                                         microsecond=0)
@@ -40,7 +40,7 @@ def get_layout(session_id):
         templates = eq_data.filter_by_dates(
             start_date, end_date
         ).get_templateids()
-        sizes = get_sizes(filtered_data.data)
+        sizes = get_sizes(filtered_data)
         opacities = get_opacities(filtered_data.get_datetimes())
         california_data = is_california_data(eq_data.catalog_type)
 
@@ -70,9 +70,7 @@ def get_layout(session_id):
                     start_date,
                     end_date,
                     default_end_date,
-                    filtered_data.data.select_dtypes(
-                        include='number'
-                    ).columns,
+                    eq_data.get_columns(include='number'),
                     california_data,
                     templates
                 ))
@@ -172,7 +170,7 @@ def update_map(slider_value, apply_clicks, start_date, end_date,
         filtered_data = filtered_data.filter_by_template_id(template_id)
 
     sizes = get_sizes(
-        filtered_data.data,
+        filtered_data,
         eq_data.get_column_params(size_column)
     )
     opacities = get_opacities(
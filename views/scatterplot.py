@@ -24,7 +24,7 @@ def get_layout(session_id):
     """
     eq_data = earthquake_data.get_earthquake_data(session_id)
 
-    if eq_data is None or eq_data.data.shape == (0, 0):
+    if eq_data is None or eq_data.get_row_count() == 0:
         return 'No uploaded data found'
 
     start_date, end_date = eq_data.get_daterange()
@@ -45,11 +45,11 @@ def get_layout(session_id):
         eq_data.get_magnitudes().name
     )
     sizes = get_sizes(
-        filtered_data.data,
+        filtered_data,
         default_size_column,
         is_map=False
     )
-    size_data = filtered_data.data[default_size_column[0]]
+    size_data = filtered_data.get_column(default_size_column[0])
 
     return dcc.Loading(html.Div([
         dbc.Row([
@@ -68,10 +68,8 @@ def get_layout(session_id):
             ),
             dbc.Col(scatterplot_config.get_component(
                 start_date, end_date, default_end_date,
-                filtered_data.data.columns,
-                filtered_data.data.select_dtypes(
-                    include='number'
-                ),
+                eq_data.get_columns(),
+                eq_data.get_columns(include='number'),
                 x_axis.name, y_axis.name,
                 default_size_column[0]
             ))
@@ -112,23 +110,23 @@ def update_output(clicks, start_date, end_date, x_axis, y_axis,
     filtered_data = eq_data.filter_by_dates(start_date, end_date)
 
     sizes = get_sizes(
-        filtered_data.data,
+        filtered_data,
         eq_data.get_column_params(size_column),
         False
     )
     size_data = None
     if size_column is not None:
-        size_data = filtered_data.data[size_column]
+        size_data = filtered_data.get_column(size_column)
 
     event_ids = filtered_data.get_eventids()
 
     if color_column is None:
         colors = 'red'
     else:
-        colors = filtered_data.data[color_column]
+        colors = filtered_data.get_column(color_column)
 
-    x_axis = filtered_data.data[x_axis]
-    y_axis = filtered_data.data[y_axis]
+    x_axis = filtered_data.get_column(x_axis)
+    y_axis = filtered_data.get_column(y_axis)
 
     return scatterplot.get_component(
         x_axis, y_axis, event_ids, colors, sizes, size_data
@@ -1,12 +1,14 @@
+import dash
 import dash_html_components as html
 import dash_core_components as dcc
-from dash.dependencies import Input, Output, State
+from dash.dependencies import Input, Output
 from dash.exceptions import PreventUpdate
+from flask import request, jsonify
 
-from app import app
+from app import app, server
 from components import uploader
 from components import instructions
-from utils import session
+from utils import session, dataparser
 
 
 def get_layout():
@@ -18,22 +20,52 @@ def get_layout():
     ]))
 
 
+@server.route(uploader.UPLOAD_URL, methods=['POST'])
+def upload_catalog():
+    """Parse a catalog file streamed in the request body for the current
+    session. The name of the file is given in the query string. Respond
+    with the content hash identifying the parsed catalog. A new session
+    is started if the request has no valid session ID.
+    """
+    filename = request.args.get('filename')
+    if not filename:
+        return jsonify(error='Missing file name'), 400
+
+    session_id = session.get_session_id()
+    if session_id is None:
+        session_id = session.generate_request_session_id()
+
+    try:
+        digest = dataparser.parse_stream(
+            request.stream, filename, session_id
+        )
+    except Exception as ex:
+        print('Uploader:', ex)
+        return jsonify(error='The file could not be parsed'), 400
+
+    return jsonify(catalog=digest)
+
+
 @app.callback(
     Output('output-data-upload', 'children'),
-    [Input('upload-data', 'contents'),
-     Input('sample-dataset', 'n_clicks')],
-    [State('upload-data', 'filename')])
-def update_output(contents, clicks, filename):
-    """Parse the given data and update the upload output.
+    [Input('upload-result', 'value'),
+     Input('sample-dataset', 'n_clicks')])
+def update_output(search, clicks):
+    """Update the upload output after a file has been uploaded or the
+    sample dataset has been selected.
 
     Keyword arguments:
-    contents -- The contents of the uploaded data
+    search -- Query string of the upload result, set after a file has been
+        uploaded
     clicks -- Number of clicks on the sample dataset button
-    filename -- The name of the uploaded file
     """
-    if contents is None and clicks is None:
+    context = dash.callback_context
+    triggered_id = context.triggered[0]['prop_id'].split('.')[0]
+
+    use_sample_data = triggered_id == 'sample-dataset' and clicks is not None
+    if not use_sample_data and 'catalog=' not in (search or ''):
         raise PreventUpdate
     session_id = session.get_session_id()
-    return uploader.update_output(
-        contents, filename, session_id, clicks is not None
-    )
+    if session_id is None:
+        session_id = session.generate_session_id()
+    return uploader.update_output(search, session_id, use_sample_data)